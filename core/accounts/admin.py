@@ -1,6 +1,8 @@
 from django.contrib import admin
 
-from accounts.models import User, Profile
+from accounts.models import User, Profile, OutgoingEmail, AccountDeletion
 
 admin.site.register(User)
 admin.site.register(Profile)
+admin.site.register(OutgoingEmail)
+admin.site.register(AccountDeletion)
@@ -0,0 +1,62 @@
+import time
+
+from django.conf import settings
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from accounts.models import User
+
+_active_users = {}
+
+
+def is_user_active(user_id):
+    cached = _active_users.get(user_id)
+    now = time.monotonic()
+    if cached and cached[1] > now:
+        return cached[0]
+
+    if len(_active_users) >= settings.JWT_ACTIVE_CACHE_SIZE:
+        _active_users.clear()
+    is_active = bool(User.objects.filter(pk=user_id).values_list('is_active', flat=True).first())
+    _active_users[user_id] = (is_active, now + settings.JWT_ACTIVE_CACHE_TTL)
+    return is_active
+
+
+def forget_user(user_id):
+    _active_users.pop(user_id, None)
+
+
+class TokenClaimsUser:
+    is_anonymous = False
+    is_authenticated = True
+    is_active = True
+
+    def __init__(self, token):
+        self.id = self.pk = token[api_settings.USER_ID_CLAIM]
+        self.is_verified = token.get('is_verified', False)
+
+    def __str__(self):
+        return f'{self.id}: token user'
+
+    @cached_property
+    def user(self):
+        return User.objects.get(pk=self.id)
+
+    def __getattr__(self, name):
+        # Anything beyond the token claims loads the full User row on first access.
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        if not validated_token.get('is_active', True) or not is_user_active(user_id):
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return TokenClaimsUser(validated_token)
@@ -0,0 +1,84 @@
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps, features
+
+from accounts.models import Profile
+from core.cache import bump_version
+
+logger = logging.getLogger(__name__)
+
+# Pillow releases the GIL while decoding, resampling and encoding, so threads are enough
+# to keep thumbnail work off the request path.
+executor = ThreadPoolExecutor(max_workers=settings.AVATAR_WORKERS, thread_name_prefix='avatar')
+
+
+def content_name(upload):
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    extension = os.path.splitext(upload.name)[1].lower()
+    name = digest.hexdigest()
+    return f'avatars/{name[:2]}/{name}{extension}'
+
+
+def store_avatar(upload):
+    name = content_name(upload)
+    if not default_storage.exists(name):
+        upload.seek(0)
+        name = default_storage.save(name, upload)
+    return name
+
+
+def thumbnail_format():
+    return ('WEBP', 'webp', 'RGBA') if features.check('webp') else ('JPEG', 'jpg', 'RGB')
+
+
+def make_thumbnails(name):
+    image_format, extension, mode = thumbnail_format()
+    with default_storage.open(name) as source:
+        image = ImageOps.exif_transpose(Image.open(source)).convert(mode)
+
+    stem = os.path.splitext(name)[0]
+    thumbnails = {}
+    for size in settings.AVATAR_THUMBNAIL_SIZES:
+        thumbnail_name = f'{stem}_{size}.{extension}'
+        if not default_storage.exists(thumbnail_name):
+            buffer = BytesIO()
+            ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS).save(
+                buffer, format=image_format, quality=85)
+            thumbnail_name = default_storage.save(thumbnail_name, ContentFile(buffer.getvalue()))
+        thumbnails[str(size)] = thumbnail_name
+    return thumbnails
+
+
+def save_thumbnails(profile_id, name):
+    thumbnails = make_thumbnails(name)
+    profile = Profile.objects.filter(id=profile_id, avatar=name)
+    user_id = profile.values_list('user_id', flat=True).first()
+    if user_id and profile.update(avatar_thumbnails=thumbnails):
+        bump_version(user_id)
+
+
+def process_in_background(profile_id, name):
+    try:
+        save_thumbnails(profile_id, name)
+    except Exception:
+        logger.exception('Could not build thumbnails of avatar %s', name)
+    finally:
+        connections.close_all()
+
+
+def schedule_thumbnails(profile):
+    profile_id, name = profile.id, profile.avatar.name
+    if settings.AVATAR_PROCESSING_SYNC:
+        transaction.on_commit(lambda: save_thumbnails(profile_id, name))
+    else:
+        transaction.on_commit(lambda: executor.submit(process_in_background, profile_id, name))
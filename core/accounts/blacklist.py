@@ -0,0 +1,104 @@
+import hashlib
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+VERSION_KEY = 'token-blacklist-version'
+
+
+class BloomFilter:
+    def __init__(self, size, hashes):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bytearray((size + 7) // 8)
+
+    def positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big')
+        return [(first + number * second) % self.size for number in range(self.hashes)]
+
+    def add(self, value):
+        for position in self.positions(value):
+            self.bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, value):
+        return all(self.bits[position // 8] & (1 << (position % 8))
+                   for position in self.positions(value))
+
+
+# A jti missing from the Bloom filter is certainly not blacklisted, so only possible hits
+# reach the database. Other processes pick up new entries through a counter in the shared
+# cache and, failing that, by polling for new rows every BLACKLIST_CACHE_SYNC_INTERVAL.
+# Polls re-read the last BLACKLIST_CACHE_SYNC_MARGIN seconds, since rows can commit out of
+# id and timestamp order.
+class BlacklistCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.filter = None
+        self.loaded_at = None
+        self.version = None
+        self.synced_at = 0
+
+    def reset(self):
+        with self.lock:
+            self.filter = None
+
+    def load(self, since):
+        started = timezone.now()
+        rows = BlacklistedToken.objects.all()
+        if since is not None:
+            margin = timedelta(seconds=settings.BLACKLIST_CACHE_SYNC_MARGIN)
+            rows = rows.filter(blacklisted_at__gte=since - margin)
+        for jti in rows.values_list('token__jti', flat=True).iterator(chunk_size=10000):
+            self.filter.add(jti)
+        self.loaded_at = started
+
+    def is_stale(self, version):
+        expired = time.monotonic() - self.synced_at > settings.BLACKLIST_CACHE_SYNC_INTERVAL
+        return version != self.version or expired
+
+    def sync(self):
+        version = cache.get(VERSION_KEY)
+        with self.lock:
+            if self.filter is None:
+                self.filter = BloomFilter(settings.BLACKLIST_BLOOM_SIZE,
+                                          settings.BLACKLIST_BLOOM_HASHES)
+                self.load(None)
+            elif self.is_stale(version):
+                self.load(self.loaded_at)
+            self.version = version
+            self.synced_at = time.monotonic()
+
+    def might_contain(self, jti):
+        self.sync()
+        return jti in self.filter
+
+    def add(self, jti):
+        with self.lock:
+            if self.filter is not None:
+                self.filter.add(jti)
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+blacklist_cache = BlacklistCache()
+
+
+class CachedRefreshToken(RefreshToken):
+    def check_blacklist(self):
+        if blacklist_cache.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def blacklist(self):
+        result = super().blacklist()
+        blacklist_cache.add(self.payload[api_settings.JTI_CLAIM])
+        return result
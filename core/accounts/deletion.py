@@ -0,0 +1,133 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from accounts.authentication import forget_user
+from accounts.models import AccountDeletion, OutgoingEmail, Profile, User
+from core.cache import bump_version
+from habit.models import (
+    Habit, HabitPeriod, HabitSchedule, HabitStats, RollupDelta, Tracking, UserActivityDay
+)
+from habit.rollups import forget_user_habits
+
+
+def request_deletion(user):
+    with transaction.atomic():
+        User.objects.filter(id=user.id).update(is_active=False)
+        deletion, created = AccountDeletion.objects.get_or_create(
+            user_id=user.id, defaults={'email': user.email})
+        if created:
+            # Habits are removed later without signals, so they leave the rollups now.
+            forget_user_habits(user.id)
+    forget_user(user.id)
+    bump_version(user.id)
+    return deletion
+
+
+def _raw_delete(queryset, batch_size):
+    # Deletes by primary key without the cascade collector, so nothing is loaded into memory
+    # and no per-row signals fire. Children are always removed before their parents.
+    ids = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+    if not ids:
+        return 0
+    return queryset.model._base_manager.filter(pk__in=ids)._raw_delete(queryset.db)
+
+
+def _delete_profile(deletion, batch_size):
+    profile = Profile.objects.filter(user_id=deletion.user_id).values(
+        'id', 'avatar', 'avatar_thumbnails').first()
+    if profile is None:
+        return 0
+
+    # Avatars are stored by content hash, so the files may belong to other profiles too.
+    shared = Profile.objects.filter(avatar=profile['avatar']).exclude(id=profile['id']).exists()
+    if profile['avatar'] and not shared:
+        for name in [profile['avatar'], *profile['avatar_thumbnails'].values()]:
+            default_storage.delete(name)
+    return Profile.objects.filter(id=profile['id'])._raw_delete(Profile.objects.db)
+
+
+def _detach_rollup_deltas(deletion, batch_size):
+    # forget_user_habits already subtracted completions that are still waiting to be folded,
+    # so these deltas keep their per-frequency part and only lose the per-user day.
+    ids = list(RollupDelta.objects.filter(user_id=deletion.user_id).order_by()
+               .values_list('pk', flat=True)[:batch_size])
+    return RollupDelta.objects.filter(pk__in=ids).update(user=None, day=None)
+
+
+def _delete_user(deletion, batch_size):
+    deleted, _ = User.objects.filter(id=deletion.user_id).delete()
+    return deleted
+
+
+STAGES = {
+    'trackings': lambda deletion, batch_size: _raw_delete(
+        Tracking.objects.filter(habit__user_id=deletion.user_id), batch_size),
+    'habit_stats': lambda deletion, batch_size: _raw_delete(
+        HabitStats.objects.filter(habit__user_id=deletion.user_id), batch_size),
+    'habit_periods': lambda deletion, batch_size: _raw_delete(
+        HabitPeriod.objects.filter(habit__user_id=deletion.user_id), batch_size),
+    'habit_schedules': lambda deletion, batch_size: _raw_delete(
+        HabitSchedule.objects.filter(habit__user_id=deletion.user_id), batch_size),
+    'habits': lambda deletion, batch_size: _raw_delete(
+        Habit.objects.filter(user_id=deletion.user_id), batch_size),
+    'rollup_deltas': _detach_rollup_deltas,
+    'activity_days': lambda deletion, batch_size: _raw_delete(
+        UserActivityDay.objects.filter(user_id=deletion.user_id), batch_size),
+    'profile': _delete_profile,
+    'blacklisted_tokens': lambda deletion, batch_size: _raw_delete(
+        BlacklistedToken.objects.filter(token__user_id=deletion.user_id), batch_size),
+    'outstanding_tokens': lambda deletion, batch_size: _raw_delete(
+        OutstandingToken.objects.filter(user_id=deletion.user_id), batch_size),
+    'emails': lambda deletion, batch_size: _raw_delete(
+        OutgoingEmail.objects.filter(to=deletion.email, status=OutgoingEmail.PENDING),
+        batch_size),
+    'user': _delete_user,
+}
+
+
+def _stale_claims():
+    return Q(claimed_until__isnull=True) | Q(claimed_until__lt=timezone.now())
+
+
+def claim_next():
+    with transaction.atomic():
+        deletion = (AccountDeletion.objects.select_for_update(skip_locked=True)
+                    .filter(_stale_claims(), status=AccountDeletion.PENDING)
+                    .order_by('id').first())
+        if deletion:
+            deletion.claimed_until = timezone.now() + timedelta(
+                seconds=settings.ACCOUNT_DELETION_LEASE)
+            deletion.save(update_fields=['claimed_until', 'updated_at'])
+    return deletion
+
+
+def run_deletion(deletion, batch_size=None):
+    batch_size = batch_size or settings.ACCOUNT_DELETION_BATCH_SIZE
+    stages = list(STAGES)
+    # Every batch commits together with the progress row, so a crashed job resumes at the
+    # stage it was in once its claim expires.
+    for stage in stages[stages.index(deletion.stage) if deletion.stage else 0:]:
+        deletion.stage = stage
+        while True:
+            with transaction.atomic():
+                deleted = STAGES[stage](deletion, batch_size)
+                deletion.deleted_rows += deleted
+                deletion.claimed_until = timezone.now() + timedelta(
+                    seconds=settings.ACCOUNT_DELETION_LEASE)
+                deletion.save(update_fields=['stage', 'deleted_rows', 'claimed_until',
+                                             'updated_at'])
+            if deleted < batch_size or stage in ('profile', 'user'):
+                break
+
+    deletion.status = AccountDeletion.DONE
+    deletion.finished_at = timezone.now()
+    deletion.claimed_until = None
+    deletion.save(update_fields=['status', 'finished_at', 'claimed_until', 'updated_at'])
+    forget_user(deletion.user_id)
+    return deletion
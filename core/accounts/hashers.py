@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    # Parameters come from settings, so changing them rehashes passwords on the next login.
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_SCRYPT_BLOCK_SIZE
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_SCRYPT_PARALLELISM
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    # Needs the optional argon2-cffi package once selected with PASSWORD_HASHER=argon2.
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
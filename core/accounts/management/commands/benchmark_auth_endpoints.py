@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from accounts.models import User
+from accounts.views import LoginApiView, RegisterView
+
+PASSWORD = 'correct horse battery staple'
+
+
+class Command(BaseCommand):
+    help = ('Measure the time, CPU time and queries one login and one registration cost; '
+            'everything written is rolled back')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=20)
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        # Throttling is left out so every round reaches the serializers.
+        views = {
+            'register': RegisterView.as_view(throttle_classes=[]),
+            'login': LoginApiView.as_view(throttle_classes=[]),
+        }
+        rounds = options['rounds']
+
+        with transaction.atomic():
+            User.objects.create_user('benchmark@example.invalid', PASSWORD)
+            for name, view in views.items():
+                with CaptureQueriesContext(connection) as queries:
+                    started, cpu = time.perf_counter(), time.process_time()
+                    for number in range(rounds):
+                        email = (f'benchmark{number}@example.invalid' if name == 'register'
+                                 else 'benchmark@example.invalid')
+                        request = factory.post('/', {'email': email, 'password': PASSWORD},
+                                               format='json')
+                        response = view(request)
+                        if response.status_code >= 400:
+                            raise CommandError(f'{name} failed: {response.data}')
+                    elapsed = time.perf_counter() - started
+                    cpu = time.process_time() - cpu
+                self.stdout.write(
+                    f'{name}: {elapsed / rounds * 1000:.1f} ms, {cpu / rounds * 1000:.1f} ms CPU, '
+                    f'{len(queries) / rounds:g} queries per request')
+            transaction.set_rollback(True)
@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+PASSWORD = 'correct horse battery staple'
+
+
+class Command(BaseCommand):
+    help = 'Measure the CPU time one login spends verifying a password with each hasher'
+
+    def add_arguments(self, parser):
+        parser.add_argument('hashers', nargs='*', help=f'Any of {", ".join(settings.HASHERS)}')
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def handle(self, *args, **options):
+        for name in options['hashers'] or settings.HASHERS:
+            if name not in settings.HASHERS:
+                raise CommandError(f'Unknown hasher {name}')
+            hasher = import_string(settings.HASHERS[name])()
+            try:
+                encoded = hasher.encode(PASSWORD, hasher.salt())
+            except ValueError as error:
+                self.stderr.write(f'{name}: {error}')
+                continue
+
+            started = time.process_time()
+            for _ in range(options['rounds']):
+                hasher.verify(PASSWORD, encoded)
+            per_login = (time.process_time() - started) / options['rounds']
+            self.stdout.write(f'{name}: {per_login * 1000:.1f} ms CPU per login')
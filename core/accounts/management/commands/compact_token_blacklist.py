@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding and blacklisted tokens in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.1,
+                            help='Seconds to pause between batches')
+
+    def delete_batch(self, expired_before, batch_size):
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=expired_before)
+            .order_by('id').values_list('id', flat=True)[:batch_size])
+        with transaction.atomic():
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            OutstandingToken.objects.filter(id__in=ids).delete()
+        return len(ids)
+
+    def handle(self, *args, **options):
+        expired_before = timezone.now()
+        deleted = total = self.delete_batch(expired_before, options['batch_size'])
+        while deleted == options['batch_size']:
+            time.sleep(options['sleep'])
+            deleted = self.delete_batch(expired_before, options['batch_size'])
+            total += deleted
+        self.stdout.write(self.style.SUCCESS(f'Deleted {total} expired tokens'))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.deletion import claim_next, run_deletion
+
+
+class Command(BaseCommand):
+    help = 'Delete the data of deactivated accounts in bounded batches, resuming unfinished jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new jobs')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds to sleep when there is nothing to delete')
+
+    def handle(self, *args, **options):
+        while True:
+            deletion = claim_next()
+            if deletion:
+                run_deletion(deletion, options['batch_size'])
+                self.stdout.write(
+                    f'Deleted account {deletion.user_id}: {deletion.deleted_rows} rows')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
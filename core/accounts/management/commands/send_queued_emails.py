@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.send_email import SendEmail
+
+
+class Command(BaseCommand):
+    help = 'Send queued outgoing emails, retrying failed deliveries with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', action='store_true', help='Keep polling the queue')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds to sleep when the queue is empty')
+
+    def handle(self, *args, **options):
+        while True:
+            emails = SendEmail.send_pending(options['batch_size'])
+            sent = sum(1 for outgoing in emails if outgoing.status == outgoing.SENT)
+            if emails:
+                self.stdout.write(f'Sent {sent} of {len(emails)} queued emails')
+            if not options['loop']:
+                break
+            if len(emails) < options['batch_size']:
+                time.sleep(options['interval'])
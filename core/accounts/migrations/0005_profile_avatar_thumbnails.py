@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 19:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='avatar_thumbnails',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Avatar thumbnails'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-18 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_profile_avatar_thumbnails'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.IntegerField(unique=True, verbose_name='User id')),
+                ('email', models.EmailField(max_length=255, verbose_name='Email address')),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('done', 'done')], default='pending', max_length=10, verbose_name='Status')),
+                ('stage', models.CharField(blank=True, max_length=30, verbose_name='Stage')),
+                ('deleted_rows', models.BigIntegerField(default=0, verbose_name='Deleted rows')),
+                ('claimed_until', models.DateTimeField(blank=True, null=True, verbose_name='Claimed until')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='accountdeletion',
+            index=models.Index(fields=['status', 'claimed_until'], name='account_deletion_queue_idx'),
+        ),
+    ]
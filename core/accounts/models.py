@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
+from django.utils import timezone
 from rest_framework_simplejwt.tokens import RefreshToken
 
 
@@ -44,6 +45,8 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     def tokens(self):
         refresh = RefreshToken.for_user(self)
+        refresh['is_active'] = self.is_active
+        refresh['is_verified'] = self.is_verified
         return {"refresh": str(refresh), "access": str(refresh.access_token)}
 
 
@@ -55,6 +58,8 @@ class Profile(models.Model):
         User, on_delete=models.CASCADE, related_name='profile', verbose_name='User')
     name = models.CharField(max_length=150, verbose_name='Name')
     avatar = models.ImageField(verbose_name='Avatar')
+    avatar_thumbnails = models.JSONField(default=dict, blank=True,
+                                         verbose_name='Avatar thumbnails')
     language = models.CharField(choices=LANGUAGE_CHOICE, max_length=5, verbose_name='Language')
     color_theme = models.CharField(choices=COLOR_THEME, max_length=50, verbose_name='Color theme')
 
@@ -63,3 +68,59 @@ class Profile(models.Model):
 
     def __str__(self):
         return f'{self.id}: {self.user.email}'
+
+
+class OutgoingEmail(models.Model):
+    PENDING, SENT, FAILED = 'pending', 'sent', 'failed'
+    STATUS_CHOICE = [(PENDING, 'pending'), (SENT, 'sent'), (FAILED, 'failed')]
+
+    to = models.EmailField(max_length=255, verbose_name='Recipient')
+    subject = models.CharField(max_length=255, verbose_name='Subject')
+    body = models.TextField(verbose_name='Body')
+    dedupe_key = models.CharField(max_length=255, null=True, blank=True,
+                                  verbose_name='Deduplication key')
+    status = models.CharField(choices=STATUS_CHOICE, default=PENDING, max_length=10,
+                              verbose_name='Status')
+    attempts = models.IntegerField(default=0, verbose_name='Attempts')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Next attempt at')
+    last_error = models.TextField(blank=True, verbose_name='Last error')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outgoing_email_queue_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['dedupe_key'], condition=models.Q(status='pending'),
+                                    name='unique_pending_email'),
+        ]
+
+    def __str__(self):
+        return f'{self.id}: {self.to} ({self.status})'
+
+
+class AccountDeletion(models.Model):
+    PENDING, DONE = 'pending', 'done'
+    STATUS_CHOICE = [(PENDING, 'pending'), (DONE, 'done')]
+
+    user_id = models.IntegerField(unique=True, verbose_name='User id')
+    email = models.EmailField(max_length=255, verbose_name='Email address')
+    status = models.CharField(choices=STATUS_CHOICE, default=PENDING, max_length=10,
+                              verbose_name='Status')
+    stage = models.CharField(max_length=30, blank=True, verbose_name='Stage')
+    deleted_rows = models.BigIntegerField(default=0, verbose_name='Deleted rows')
+    claimed_until = models.DateTimeField(null=True, blank=True, verbose_name='Claimed until')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'claimed_until'], name='account_deletion_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.email} ({self.status}, {self.stage or "queued"})'
@@ -1,15 +1,106 @@
-from django.core.mail import EmailMessage
-from core import settings
+from contextlib import suppress
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import OutgoingEmail
 
 
 class SendEmail:
     @staticmethod
-    def send_email(email, subject, body):
-        email = EmailMessage(
-            subject=subject,
-            body=body,
-            from_email=settings.EMAIL_HOST_USER,
-            to=[email]
-        )
-        email.fail_silently = False
-        email.send()
+    def send_email(email, subject, body, dedupe_key=None):
+        fields = {'to': email, 'subject': subject, 'body': body}
+        if dedupe_key is None:
+            return OutgoingEmail.objects.create(**fields)
+
+        # A replaced message is due again at once, even if a worker is sending the old one.
+        outgoing, _ = OutgoingEmail.objects.update_or_create(
+            dedupe_key=dedupe_key, status=OutgoingEmail.PENDING,
+            defaults={**fields, 'next_attempt_at': timezone.now()})
+        return outgoing
+
+    @staticmethod
+    def send_many(messages):
+        # Messages whose dedupe key is already pending are skipped rather than replaced.
+        return OutgoingEmail.objects.bulk_create(
+            [OutgoingEmail(to=email, subject=subject, body=body, dedupe_key=dedupe_key)
+             for email, subject, body, dedupe_key in messages],
+            ignore_conflicts=True)
+
+    @staticmethod
+    def mark_failed(outgoing, error):
+        outgoing.attempts += 1
+        outgoing.last_error = str(error)
+        if outgoing.attempts >= settings.EMAIL_QUEUE_MAX_ATTEMPTS:
+            outgoing.status = OutgoingEmail.FAILED
+        else:
+            delay = settings.EMAIL_QUEUE_RETRY_DELAY * 2 ** (outgoing.attempts - 1)
+            outgoing.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+
+    @classmethod
+    def deliver(cls, connection, outgoing):
+        message = EmailMessage(subject=outgoing.subject, body=outgoing.body,
+                               from_email=settings.EMAIL_HOST_USER, to=[outgoing.to])
+        try:
+            connection.send_messages([message])
+        except Exception as error:
+            cls.mark_failed(outgoing, error)
+            return
+        outgoing.status = OutgoingEmail.SENT
+        outgoing.sent_at = timezone.now()
+
+    @classmethod
+    def deliver_batch(cls, emails):
+        # One SMTP connection is opened per batch and shared by all of its messages.
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+        except Exception as error:
+            for outgoing in emails:
+                cls.mark_failed(outgoing, error)
+            return
+
+        try:
+            for outgoing in emails:
+                cls.deliver(connection, outgoing)
+        finally:
+            with suppress(Exception):
+                connection.close()
+
+    @staticmethod
+    def claim(batch_size):
+        # Claimed rows are leased by moving their next attempt past the lease, so the row locks
+        # are released before any SMTP traffic and a crashed worker's batch is retried later.
+        lease = timezone.now() + timedelta(seconds=settings.EMAIL_QUEUE_LEASE)
+        with transaction.atomic():
+            emails = list(
+                OutgoingEmail.objects.select_for_update(skip_locked=True)
+                .filter(status=OutgoingEmail.PENDING, next_attempt_at__lte=timezone.now())
+                .order_by('next_attempt_at')[:batch_size])
+            OutgoingEmail.objects.filter(id__in=[outgoing.id for outgoing in emails]).update(
+                next_attempt_at=lease)
+        return emails, lease
+
+    @classmethod
+    def send_pending(cls, batch_size=100):
+        emails, lease = cls.claim(batch_size)
+        if not emails:
+            return emails
+        cls.deliver_batch(emails)
+
+        # Rows replaced by send_email() while they were being sent no longer carry the lease
+        # and stay pending with their new content.
+        leased = OutgoingEmail.objects.filter(next_attempt_at=lease)
+        sent = [outgoing for outgoing in emails if outgoing.status == OutgoingEmail.SENT]
+        if sent:
+            leased.filter(id__in=[outgoing.id for outgoing in sent]).update(
+                status=OutgoingEmail.SENT, sent_at=sent[0].sent_at)
+        for outgoing in emails:
+            if outgoing.status != OutgoingEmail.SENT:
+                leased.filter(id=outgoing.id).update(
+                    status=outgoing.status, attempts=outgoing.attempts,
+                    next_attempt_at=outgoing.next_attempt_at, last_error=outgoing.last_error)
+        return emails
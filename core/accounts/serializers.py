@@ -1,14 +1,19 @@
 from django.contrib import auth
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.core.files.storage import default_storage
 from django.utils.encoding import force_str
 from django.utils.http import urlsafe_base64_decode
 from rest_framework import serializers
 from rest_framework.exceptions import AuthenticationFailed
-from rest_framework_simplejwt.tokens import RefreshToken, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.tokens import TokenError
 
 from accounts import messages
+from accounts.avatars import store_avatar, schedule_thumbnails
+from accounts.blacklist import CachedRefreshToken
 from accounts.models import User, Profile
+from core.updates import DirtyFieldsMixin
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -20,16 +25,14 @@ class RegisterSerializer(serializers.ModelSerializer):
         fields = ['email', 'password', 'tokens']
 
     def create(self, validated_data):
-        self.user = get_user_model().objects.create_user(**validated_data)
-        self.user.save()
-        return self.user
+        return get_user_model().objects.create_user(**validated_data)
 
     def get_tokens(self, obj):
-        user = get_user_model().objects.get(email=self.user.email)
+        tokens = obj.tokens()
 
         return {
-            'access': user.tokens()['access'],
-            'refresh': user.tokens()['refresh'],
+            'access': tokens['access'],
+            'refresh': tokens['refresh'],
         }
 
 
@@ -39,11 +42,11 @@ class LoginSerializer(serializers.Serializer):
     tokens = serializers.SerializerMethodField()
 
     def get_tokens(self, obj):
-        user = get_user_model().objects.get(email=obj['email'])
+        tokens = obj['user'].tokens()
 
         return {
-            'access': user.tokens()['access'],
-            'refresh': user.tokens()['refresh']
+            'access': tokens['access'],
+            'refresh': tokens['refresh']
         }
 
     class Meta:
@@ -59,6 +62,7 @@ class LoginSerializer(serializers.Serializer):
             raise AuthenticationFailed('Вы ввели неправильный логин или пароль!')
         if not user.is_active:
             raise AuthenticationFailed('Аккаунт отключен, обратитесь к администратору')
+        attrs['user'] = user
         return super().validate(attrs)
 
 
@@ -75,11 +79,15 @@ class LogoutSerializer(serializers.Serializer):
 
     def save(self, **kwargs):
         try:
-            RefreshToken(self.token).blacklist()
+            CachedRefreshToken(self.token).blacklist()
         except TokenError:
             self.fail('bad_token')
 
 
+class CachedTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = CachedRefreshToken
+
+
 class UserDetailSerializer(serializers.ModelSerializer):
     name = serializers.SerializerMethodField
 
@@ -90,15 +98,38 @@ class UserDetailSerializer(serializers.ModelSerializer):
         ]
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(DirtyFieldsMixin, serializers.ModelSerializer):
+    avatar_urls = serializers.SerializerMethodField()
+
     class Meta:
         model = Profile
-        fields = ['name', 'avatar', 'language', 'color_theme', 'created_at', 'updated_at']
+        fields = [
+            'name', 'avatar', 'avatar_urls', 'language', 'color_theme', 'created_at', 'updated_at'
+        ]
+
+    def get_avatar_urls(self, obj):
+        return {size: default_storage.url(name) for size, name in obj.avatar_thumbnails.items()}
+
+    @staticmethod
+    def store_avatar(validated_data):
+        if 'avatar' in validated_data:
+            validated_data['avatar'] = store_avatar(validated_data['avatar'])
+            validated_data['avatar_thumbnails'] = {}
 
     def create(self, validated_data):
         user = self.context['request'].user
         validated_data['user'] = user
-        return super().create(validated_data)
+        self.store_avatar(validated_data)
+        profile = super().create(validated_data)
+        schedule_thumbnails(profile)
+        return profile
+
+    def update(self, instance, validated_data):
+        self.store_avatar(validated_data)
+        profile = super().update(instance, validated_data)
+        if 'avatar' in validated_data:
+            schedule_thumbnails(profile)
+        return profile
 
 
 class RequestPasswordResetEmailSerializer(serializers.ModelSerializer):
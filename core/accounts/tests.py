@@ -1,3 +1,469 @@
-from django.test import TestCase
+import os
+import shutil
+import time
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from PIL import Image
+
+from django.conf import settings
+from django.contrib import auth
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from accounts import deletion, throttling
+from accounts.authentication import TokenClaimsUser
+from accounts.blacklist import blacklist_cache
+from accounts.models import User, Profile, OutgoingEmail, AccountDeletion
+from accounts.send_email import SendEmail
+from habit import rollups
+from habit.models import FrequencyRollup, Habit, HabitStats, Tracking, UserActivityDay
+
+
+class ProfileCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('user@example.com', 'password')
+        Profile.objects.create(user=self.user, name='Name', avatar='avatar.png',
+                               language='en', color_theme='white')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('profile')
+
+    def test_retrieve_is_cached_until_update(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+        self.client.put(self.url, {'name': 'Renamed'}, format='multipart')
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['name'], 'Renamed')
+
+    def test_update_writes_only_changed_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.put(self.url, {'name': 'Renamed', 'language': 'en'}, format='multipart')
+        updates = [query['sql'] for query in queries
+                   if query['sql'].startswith('UPDATE "accounts_profile"')]
+        self.assertEqual(len(updates), 1)
+        self.assertRegex(updates[0], r'^UPDATE "accounts_profile" SET "name" = \'Renamed\', '
+                                     r'"updated_at" = \'[^\']+\' WHERE')
+
+
+class EmailQueueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user@example.com', 'password')
+        self.url = reverse('request_reset_password')
+
+    def test_reset_request_only_enqueues(self):
+        response = self.client.post(self.url, {'email': self.user.email})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.PENDING)
+
+    def test_repeated_reset_requests_are_deduplicated(self):
+        self.client.post(self.url, {'email': self.user.email})
+        self.client.post(self.url, {'email': self.user.email})
+        self.assertEqual(OutgoingEmail.objects.count(), 1)
+
+    def test_worker_sends_batch(self):
+        SendEmail.send_email('first@example.com', 'Subject', 'Body')
+        SendEmail.send_email('second@example.com', 'Subject', 'Body')
+
+        call_command('send_queued_emails', stdout=open('/dev/null', 'w'))
+        self.assertEqual([message.to for message in mail.outbox],
+                         [['first@example.com'], ['second@example.com']])
+        self.assertFalse(OutgoingEmail.objects.exclude(status=OutgoingEmail.SENT).exists())
+
+    def test_failed_delivery_is_retried_later(self):
+        outgoing = SendEmail.send_email('user@example.com', 'Subject', 'Body')
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=OSError('connection reset')):
+            SendEmail.send_pending()
+
+        outgoing.refresh_from_db()
+        self.assertEqual((outgoing.status, outgoing.attempts), (OutgoingEmail.PENDING, 1))
+        self.assertEqual(SendEmail.send_pending(), [])
+
+    def test_rows_are_not_locked_while_sending(self):
+        outgoing = SendEmail.send_email('user@example.com', 'Subject', 'Old', dedupe_key='reset')
+
+        def replace_while_sending(messages):
+            # A repeated request during delivery replaces the message instead of being lost.
+            SendEmail.send_email('user@example.com', 'Subject', 'New', dedupe_key='reset')
+            return len(messages)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=replace_while_sending):
+            SendEmail.send_pending()
+        outgoing.refresh_from_db()
+        self.assertEqual((outgoing.status, outgoing.body), (OutgoingEmail.PENDING, 'New'))
+
+        SendEmail.send_pending()
+        self.assertEqual([message.body for message in mail.outbox], ['New'])
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.SENT)
+
+    def test_crashed_worker_batch_is_retried_after_the_lease(self):
+        SendEmail.send_email('user@example.com', 'Subject', 'Body')
+        with mock.patch.object(SendEmail, 'deliver_batch', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                SendEmail.send_pending()
+        self.assertEqual(SendEmail.send_pending(), [])
+
+        later = timezone.now() + timedelta(seconds=settings.EMAIL_QUEUE_LEASE + 1)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            SendEmail.send_pending()
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class AuthTokenTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user@example.com', 'password')
+
+    def test_login_does_one_user_query_and_mints_one_pair(self):
+        with mock.patch.object(RefreshToken, 'for_user', wraps=RefreshToken.for_user) as mint:
+            # One SELECT of the user and one INSERT of the outstanding refresh token.
+            with self.assertNumQueries(2):
+                response = self.client.post(
+                    reverse('login'), {'email': 'user@example.com', 'password': 'password'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mint.call_count, 1)
+        tokens = response.data['tokens']
+        self.assertEqual(AccessToken(tokens['access'])['user_id'],
+                         RefreshToken(tokens['refresh'])['user_id'])
+
+    def test_register_mints_one_pair(self):
+        with mock.patch.object(RefreshToken, 'for_user', wraps=RefreshToken.for_user) as mint:
+            # Unique email check, user INSERT and outstanding refresh token INSERT.
+            with self.assertNumQueries(3):
+                response = self.client.post(
+                    reverse('register'), {'email': 'new@example.com', 'password': 'password'})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(mint.call_count, 1)
+        self.assertEqual(set(response.data['tokens']), {'access', 'refresh'})
+
+    def test_benchmark_reports_each_endpoint_and_rolls_back(self):
+        out = StringIO()
+        call_command('benchmark_auth_endpoints', '--rounds', '1', stdout=out)
+        self.assertRegex(out.getvalue(), r'^register: [\d.]+ ms, [\d.]+ ms CPU, 3 queries')
+        self.assertRegex(out.getvalue(), r'\nlogin: [\d.]+ ms, [\d.]+ ms CPU, 2 queries')
+        self.assertEqual(User.objects.count(), 1)
+
+
+class TokenClaimsUserTests(TestCase):
+    def test_claims_are_read_without_queries_and_the_rest_lazily(self):
+        user = User.objects.create_user('user@example.com', 'password')
+        token = AccessToken(user.tokens()['access'])
+
+        with self.assertNumQueries(0):
+            token_user = TokenClaimsUser(token)
+            self.assertEqual((token_user.id, token_user.is_verified), (user.id, False))
+        with self.assertNumQueries(1):
+            self.assertEqual(token_user.email, 'user@example.com')
+            self.assertEqual(token_user.created_at, user.created_at)
+
+
+class TokenBlacklistTests(TestCase):
+    def setUp(self):
+        blacklist_cache.reset()
+        self.user = User.objects.create_user('user@example.com', 'password')
+        self.client = APIClient()
+        self.tokens = self.user.tokens()
+
+    def refresh(self):
+        return self.client.post(reverse('token_refresh'), {'refresh': self.tokens['refresh']})
+
+    def test_refresh_skips_blacklist_query_for_unknown_tokens(self):
+        self.refresh()
+        with self.assertNumQueries(0):
+            response = self.refresh()
+        self.assertEqual(response.status_code, 200)
+
+    def test_logout_blacklists_refresh_token(self):
+        self.refresh()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tokens["access"]}')
+        response = self.client.post(reverse('logout'), {'refresh': self.tokens['refresh']})
+        self.assertEqual(response.status_code, 204)
+
+        self.assertEqual(self.refresh().status_code, 401)
+
+    def test_blacklist_is_loaded_from_database(self):
+        RefreshToken(self.tokens['refresh']).blacklist()
+        self.assertEqual(self.refresh().status_code, 401)
+
+    def test_rows_committed_out_of_id_order_are_picked_up(self):
+        other = OutstandingToken.objects.get(jti=RefreshToken.for_user(self.user)['jti'])
+        BlacklistedToken.objects.create(id=100, token=other)
+        self.assertEqual(self.refresh().status_code, 200)
+
+        # Another process blacklists the token in a transaction that took a lower id.
+        token = OutstandingToken.objects.get(jti=RefreshToken(self.tokens['refresh'])['jti'])
+        BlacklistedToken.objects.create(id=50, token=token)
+        blacklist_cache.synced_at = 0
+        self.assertEqual(self.refresh().status_code, 401)
+
+    def test_compaction_removes_only_expired_tokens(self):
+        RefreshToken(self.tokens['refresh']).blacklist()
+        expired = RefreshToken.for_user(self.user)
+        RefreshToken(str(expired)).blacklist()
+        OutstandingToken.objects.filter(jti=expired['jti']).update(expires_at=timezone.now())
+
+        call_command('compact_token_blacklist', batch_size=1, sleep=0,
+                     stdout=open('/dev/null', 'w'))
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+
+class AvatarTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, AVATAR_PROCESSING_SYNC=True,
+            AVATAR_THUMBNAIL_SIZES=[64, 128])
+        self.settings_override.enable()
+        self.user = User.objects.create_user('user@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    @staticmethod
+    def image(name='avatar.png', color='red'):
+        buffer = BytesIO()
+        Image.new('RGB', (400, 300), color).save(buffer, format='PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def create_profile(self, avatar):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('profile'), {
+                'name': 'Name', 'avatar': avatar, 'language': 'en', 'color_theme': 'white'
+            }, format='multipart')
+
+    def test_avatar_is_stored_under_content_hash_with_thumbnails(self):
+        self.assertEqual(self.create_profile(self.image()).status_code, 201)
+
+        profile = Profile.objects.get()
+        self.assertRegex(profile.avatar.name, r'^avatars/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertEqual(set(profile.avatar_thumbnails), {'64', '128'})
+        for name in profile.avatar_thumbnails.values():
+            with Image.open(os.path.join(self.media_root, name)) as thumbnail:
+                self.assertIn(thumbnail.size, [(64, 64), (128, 128)])
+
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        response = self.client.get(reverse('profile'))
+        self.assertEqual(set(response.data['avatar_urls']), {'64', '128'})
+
+    def test_identical_uploads_share_files(self):
+        self.create_profile(self.image('first.png'))
+        first = Profile.objects.get().avatar.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(reverse('profile'), {'avatar': self.image('second.PNG')},
+                            format='multipart')
+        self.assertEqual(Profile.objects.get().avatar.name, first)
+
+
+@override_settings(AVATAR_PROCESSING_SYNC=True, AVATAR_THUMBNAIL_SIZES=[64])
+class AccountDeletionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = self.create_user('user@example.com', 'red')
+        self.other = self.create_user('other@example.com', 'red')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user.tokens()["access"]}')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def create_user(self, email, color):
+        user = User.objects.create_user(email, 'password')
+        client = APIClient()
+        client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(reverse('profile'), {
+                'name': 'Name', 'avatar': AvatarTests.image(color=color), 'language': 'en',
+                'color_theme': 'white'
+            }, format='multipart')
+        for number in range(3):
+            habit = Habit.objects.create(
+                user=user, title=f'Habit {number}', description='Description',
+                number_of_repeats=10, execution_frequency='day',
+                start_date=timezone.localdate(), end_date=timezone.localdate())
+            Tracking.objects.create(habit=habit, amount_of_days=1, done_date=habit.start_date)
+        user.tokens()
+        return user
+
+    def avatar_files(self, user):
+        profile = Profile.objects.get(user=user)
+        return [profile.avatar.name, *profile.avatar_thumbnails.values()]
+
+    def test_request_deactivates_and_job_removes_everything(self):
+        response = self.client.delete(reverse('delete_user'))
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_active)
+        self.assertEqual(self.client.get(reverse('habit-list')).status_code, 401)
+
+        call_command('process_account_deletions', '--batch-size', '2', stdout=StringIO())
+
+        job = AccountDeletion.objects.get(user_id=self.user.pk)
+        self.assertEqual((job.status, job.stage), (AccountDeletion.DONE, 'user'))
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Habit.objects.filter(user_id=self.user.pk).exists())
+        self.assertFalse(OutstandingToken.objects.filter(user_id=self.user.pk).exists())
+        self.assertEqual(Tracking.objects.count(), 3)
+        self.assertEqual(HabitStats.objects.count(), 3)
+        # The other profile has the same avatar content, so the shared files stay.
+        for name in self.avatar_files(self.other):
+            self.assertTrue(os.path.exists(os.path.join(self.media_root, name)))
+
+    def test_unfolded_completions_stay_in_the_rollups(self):
+        deletion.run_deletion(deletion.request_deletion(self.user))
+        rollups.fold_rollups()
+        rollup = FrequencyRollup.objects.get(execution_frequency='day')
+        self.assertEqual((rollup.habits, rollup.completions), (3, 3))
+        self.assertFalse(UserActivityDay.objects.filter(user_id=self.user.pk).exists())
+
+    def test_unshared_avatar_files_are_removed(self):
+        files = self.avatar_files(self.user)
+        Profile.objects.filter(user=self.other).update(avatar='other.png')
+        deletion.run_deletion(deletion.request_deletion(self.user))
+        for name in files:
+            self.assertFalse(os.path.exists(os.path.join(self.media_root, name)))
+
+    def test_interrupted_job_resumes_at_its_stage(self):
+        deletion.request_deletion(self.user)
+        delete_habits = deletion.STAGES['habits']
+        calls = []
+
+        def crash(job, batch_size):
+            calls.append(job)
+            if len(calls) > 1:
+                raise RuntimeError('worker died')
+            return delete_habits(job, batch_size)
+
+        with mock.patch.dict(deletion.STAGES, habits=crash), self.assertRaises(RuntimeError):
+            deletion.run_deletion(deletion.claim_next(), batch_size=1)
+        job = AccountDeletion.objects.get(user_id=self.user.pk)
+        self.assertEqual(job.stage, 'habits')
+        self.assertEqual(Habit.objects.filter(user_id=self.user.pk).count(), 2)
+        self.assertIsNone(deletion.claim_next())
+
+        AccountDeletion.objects.update(claimed_until=timezone.now())
+        deletion.run_deletion(deletion.claim_next(), batch_size=1)
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(Habit.objects.count(), 3)
+
+
+LOGIN_BUCKETS = {
+    'login_ip': (3, 1), 'login_email': (2, 1),
+    'password_reset_ip': (10, 1), 'password_reset_email': (1, 1),
+}
+
+
+@override_settings(THROTTLE_BUCKETS=LOGIN_BUCKETS)
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('user@example.com', 'password')
+
+    def login(self, email, password='wrong-password'):
+        return self.client.post(reverse('login'), {'email': email, 'password': password})
+
+    def test_email_bucket_rejects_before_hashing(self):
+        with mock.patch('accounts.serializers.auth.authenticate',
+                        wraps=auth.authenticate) as authenticate:
+            statuses = [self.login('User@example.com ').status_code for _ in range(3)]
+        self.assertEqual(statuses, [401, 401, 429])
+        self.assertEqual(authenticate.call_count, 2)
+
+    def test_ip_bucket_spans_emails(self):
+        statuses = [self.login(f'user{number}@example.com').status_code for number in range(4)]
+        self.assertEqual(statuses[-1], 429)
+
+    def test_ip_bucket_ignores_spoofed_forwarded_for(self):
+        statuses = [
+            self.client.post(reverse('login'), {'email': f'user{number}@example.com'},
+                             HTTP_X_FORWARDED_FOR=f'10.0.0.{number}').status_code
+            for number in range(4)
+        ]
+        self.assertEqual(statuses[-1], 429)
+
+    def test_limit_recovers_over_time(self):
+        self.login('user@example.com')
+        self.login('user@example.com')
+        self.assertEqual(self.login('user@example.com', password='password').status_code, 429)
+        # Both windows are at most 180 seconds, so the earlier attempts have aged out enough.
+        with mock.patch('accounts.throttling.time.time', return_value=time.time() + 300):
+            response = self.login('user@example.com', password='password')
+        self.assertEqual(response.status_code, 200)
+
+    def test_rejected_requests_report_when_to_retry(self):
+        take = throttling.take_slot
+        with mock.patch('accounts.throttling.time.time', return_value=1200.0):
+            self.assertIsNone(take('key', 2, 1 / 60))
+            self.assertIsNone(take('key', 2, 1 / 60))
+            self.assertEqual(take('key', 2, 1 / 60), 180)
+        with mock.patch('accounts.throttling.time.time', return_value=1320.0):
+            self.assertEqual(take('key', 2, 1 / 60), 60)
+        with mock.patch('accounts.throttling.time.time', return_value=1380.0):
+            self.assertIsNone(take('key', 2, 1 / 60))
+
+    def test_non_object_bodies_are_rejected_as_invalid(self):
+        for body in ('[]', '"user@example.com"'):
+            for name in ('login', 'request_reset_password'):
+                response = self.client.post(reverse(name), body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+
+    def test_password_reset_looks_the_user_up_once(self):
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('request_reset_password'),
+                                        {'email': 'missing@example.com'})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post(reverse('request_reset_password'),
+                                    {'email': 'missing@example.com'})
+        self.assertEqual(response.status_code, 429)
+
+
+class PasswordRehashTests(TestCase):
+    def test_login_upgrades_hash_to_configured_hasher(self):
+        User.objects.create_user('user@example.com', 'password')
+        self.assertTrue(User.objects.get().password.startswith('pbkdf2_sha256$'))
+
+        hashers = ['accounts.hashers.ScryptPasswordHasher',
+                   'django.contrib.auth.hashers.PBKDF2PasswordHasher']
+        with override_settings(PASSWORD_HASHERS=hashers, PASSWORD_SCRYPT_WORK_FACTOR=2 ** 10):
+            self.client.post(
+                reverse('login'), {'email': 'user@example.com', 'password': 'password'})
+            self.assertTrue(User.objects.get().password.startswith('scrypt$1024$'))
+
+        with override_settings(PASSWORD_HASHERS=hashers, PASSWORD_SCRYPT_WORK_FACTOR=2 ** 11):
+            response = self.client.post(
+                reverse('login'), {'email': 'user@example.com', 'password': 'password'})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(User.objects.get().password.startswith('scrypt$2048$'))
+
+    def test_benchmark_reports_cpu_per_login(self):
+        out = StringIO()
+        with override_settings(PASSWORD_SCRYPT_WORK_FACTOR=2 ** 10):
+            call_command('benchmark_password_hashers', 'scrypt', '--rounds', '1', stdout=out)
+        self.assertRegex(out.getvalue(), r'^scrypt: [\d.]+ ms CPU per login')
@@ -0,0 +1,88 @@
+import hashlib
+import math
+import time
+from collections.abc import Mapping
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+
+def _increment(key, timeout):
+    cache.add(key, 0, timeout=timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr().
+        cache.add(key, 1, timeout=timeout)
+        return 1
+
+
+def take_slot(key, capacity, per_second):
+    # Returns None when the request fits, otherwise the seconds until it would.
+    # A sliding window of capacity / per_second seconds: the previous window's count is weighted
+    # by how much of it the sliding window still covers. Counters only change through atomic
+    # add/incr/decr, so concurrent bursts cannot get past the limit together.
+    window = capacity / per_second
+    index, offset = divmod(time.time(), window)
+    current = f'{key}:{int(index)}'
+    count = _increment(current, math.ceil(2 * window))
+    previous = cache.get(f'{key}:{int(index) - 1}', 0)
+    if previous * (1 - offset / window) + count <= capacity:
+        return None
+
+    cache.decr(current)
+    if count <= capacity:
+        return window * (1 - (capacity - count) / previous) - offset
+    return window - offset + window * max(0, 1 - (capacity - 1) / (count - 1))
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    scope = None
+    wait_seconds = None
+
+    def get_identity(self, request):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        identity = self.get_identity(request)
+        if not identity:
+            return True
+        capacity, per_minute = settings.THROTTLE_BUCKETS[self.scope]
+        key = f'throttle:{self.scope}:{hashlib.md5(identity.encode()).hexdigest()}'
+        self.wait_seconds = take_slot(key, capacity, per_minute / 60)
+        return self.wait_seconds is None
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPThrottle(SlidingWindowThrottle):
+    def get_identity(self, request):
+        # Uses X-Forwarded-For only behind NUM_PROXIES trusted proxies, so clients cannot
+        # rotate the header to get fresh buckets.
+        return self.get_ident(request)
+
+
+class EmailThrottle(SlidingWindowThrottle):
+    def get_identity(self, request):
+        if not isinstance(request.data, Mapping):
+            return None
+        email = request.data.get('email')
+        return email.strip().lower() if isinstance(email, str) else None
+
+
+class LoginIPThrottle(IPThrottle):
+    scope = 'login_ip'
+
+
+class LoginEmailThrottle(EmailThrottle):
+    scope = 'login_email'
+
+
+class PasswordResetIPThrottle(IPThrottle):
+    scope = 'password_reset_ip'
+
+
+class PasswordResetEmailThrottle(EmailThrottle):
+    scope = 'password_reset_email'
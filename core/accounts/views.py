@@ -9,6 +9,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from accounts import messages
+from accounts.deletion import request_deletion
 from accounts.models import User, Profile
 from accounts.send_email import SendEmail
 from accounts.serializers import (
@@ -16,6 +17,10 @@ from accounts.serializers import (
     ProfileSerializer, RequestPasswordResetEmailSerializer, PasswordTokenCheckSerializer,
     SetNewPasswordSerializer
 )
+from accounts.throttling import (
+    LoginEmailThrottle, LoginIPThrottle, PasswordResetEmailThrottle, PasswordResetIPThrottle
+)
+from core.cache import bump_version, cache_user_response
 
 
 class RegisterView(generics.GenericAPIView):
@@ -40,12 +45,14 @@ class DeleteAccountView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def delete(self, request):  # noqa
-        request.user.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        deletion = request_deletion(request.user)
+        return Response({'status': deletion.status}, status=status.HTTP_202_ACCEPTED)
 
 
 class LoginApiView(generics.GenericAPIView):
     serializer_class = LoginSerializer
+    # Throttles run before the serializer, so rejected attempts never reach the hasher.
+    throttle_classes = [LoginIPThrottle, LoginEmailThrottle]
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
@@ -75,21 +82,23 @@ class UserDetailView(generics.GenericAPIView):
 
 class RequestPasswordResetEmailView(generics.GenericAPIView):
     serializer_class = RequestPasswordResetEmailSerializer
+    throttle_classes = [PasswordResetIPThrottle, PasswordResetEmailThrottle]
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
         email = request.data.get('email')
 
-        if get_user_model().objects.filter(email=email).exists():
-            user = get_user_model().objects.get(email=email)
+        user = get_user_model().objects.filter(email=email).first()
+        if user is not None:
             uidb64 = urlsafe_base64_encode(smart_bytes(user.id))
             token = PasswordResetTokenGenerator().make_token(user)
             redirect_url = request.data.get('redirect_url')
             current_site = 'http://' + get_current_site(request=request).domain
             current_site = redirect_url if redirect_url else current_site
             reset_link = f'{current_site}?uid={uidb64}&token={token}'
-            SendEmail.send_email(user.email, 'Reset your password', reset_link)
+            SendEmail.send_email(user.email, 'Reset your password', reset_link,
+                                 dedupe_key=f'password-reset:{user.id}')
             return Response({'success': messages.TEXT_LINK_RESET_PASSWORD},
                             status=status.HTTP_200_OK)
 
@@ -158,6 +167,7 @@ class ProfileViewSet(viewsets.GenericViewSet):
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [FormParser, MultiPartParser]
 
+    @cache_user_response('profile')
     def retrieve(self, request):
         try:
             serializer = self.serializer_class(request.user.profile)
@@ -170,6 +180,7 @@ class ProfileViewSet(viewsets.GenericViewSet):
         serializer = self.serializer_class(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
         serializer.save(user=self.request.user)
+        bump_version(request.user.id)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def update(self, request):
@@ -177,6 +188,7 @@ class ProfileViewSet(viewsets.GenericViewSet):
             serializer = self.serializer_class(request.user.profile, data=request.data, partial=True)
             serializer.is_valid(raise_exception=True)
             serializer.save()
+            bump_version(request.user.id)
             return Response(serializer.data)
         except Profile.DoesNotExist:
             return Response({'error': messages.PROFILE_DOES_NOT_EXISTS},
@@ -186,6 +198,7 @@ class ProfileViewSet(viewsets.GenericViewSet):
         try:
             instance = request.user.profile
             instance.delete()
+            bump_version(request.user.id)
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Profile.DoesNotExist:
             return Response({'error': messages.PROFILE_DOES_NOT_EXISTS},
@@ -0,0 +1,78 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.exceptions import PreconditionFailed
+from core.renderers import FastJSONRenderer
+
+
+def _version_key(user_id):
+    return f'user-version:{user_id}'
+
+
+def get_version(user_id):
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        # A fresh timestamp never collides with versions used before the key was evicted.
+        cache.add(_version_key(user_id), time.time_ns(), timeout=None)
+        version = cache.get(_version_key(user_id))
+    return version
+
+
+def bump_version(user_id):
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.add(_version_key(user_id), time.time_ns(), timeout=None)
+
+
+async def abump_version(user_id):
+    try:
+        await cache.aincr(_version_key(user_id))
+    except ValueError:
+        await cache.aadd(_version_key(user_id), time.time_ns(), timeout=None)
+
+
+def make_etag(data):
+    return '"{}"'.format(hashlib.md5(FastJSONRenderer().render(data)).hexdigest())
+
+
+def check_if_match(request, data):
+    expected = request.headers.get('If-Match')
+    if expected is None or expected.strip() == '*':
+        return
+    if make_etag(data) not in {tag.strip() for tag in expected.split(',')}:
+        raise PreconditionFailed()
+
+
+def _response_key(namespace, request):
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'{namespace}:{request.user.id}:{get_version(request.user.id)}:{url}'
+
+
+def _conditional_response(request, data, etag):
+    if etag in request.headers.get('If-None-Match', ''):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    return Response(data, headers={'ETag': etag})
+
+
+def cache_user_response(namespace):
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            key = _response_key(namespace, request)
+            entry = cache.get(key)
+            if entry is None:
+                response = method(view, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                entry = (response.data, make_etag(response.data))
+                cache.set(key, entry, timeout=settings.USER_CACHE_TIMEOUT)
+            return _conditional_response(request, *entry)
+        return wrapper
+    return decorator
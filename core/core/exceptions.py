@@ -0,0 +1,22 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core import messages
+
+
+class IdempotencyKeyInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = messages.IDEMPOTENCY_KEY_IN_PROGRESS
+    default_code = 'idempotency_key_in_progress'
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = messages.IDEMPOTENCY_KEY_REUSED
+    default_code = 'idempotency_key_reused'
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = messages.PRECONDITION_FAILED
+    default_code = 'precondition_failed'
@@ -0,0 +1,104 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework.response import Response
+
+from core.exceptions import IdempotencyKeyInProgress, IdempotencyKeyReused
+from core.renderers import FastJSONRenderer
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+STORED_HEADERS = ['ETag']
+
+
+def _cache_key(namespace, user_id, key):
+    return f'idempotency:{namespace}:{user_id}:{hashlib.md5(key.encode()).hexdigest()}'
+
+
+def _fingerprint(request, body):
+    digest = hashlib.md5(f'{request.method} {request.get_full_path()} '.encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def _stored(entry, fingerprint):
+    # A key seen before either replays its response or rejects a request it does not match.
+    if entry is None:
+        return None
+    if entry['fingerprint'] != fingerprint:
+        raise IdempotencyKeyReused()
+    if 'status' not in entry:
+        raise IdempotencyKeyInProgress()
+    return entry
+
+
+def _entry(fingerprint, response, content):
+    headers = {name: response[name] for name in STORED_HEADERS if response.has_header(name)}
+    return {'fingerprint': fingerprint, 'status': response.status_code, 'headers': headers,
+            'content': content}
+
+
+def idempotent(namespace):
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return method(view, request, *args, **kwargs)
+
+            cache_key = _cache_key(namespace, request.user.id, key)
+            fingerprint = _fingerprint(request, FastJSONRenderer().render(request.data))
+            entry = _stored(cache.get(cache_key), fingerprint)
+            # The in-progress marker outlives a request, not a crashed worker.
+            if entry is None and not cache.add(cache_key, {'fingerprint': fingerprint},
+                                               timeout=settings.IDEMPOTENCY_IN_PROGRESS_TTL):
+                entry = _stored(cache.get(cache_key), fingerprint)
+            if entry is not None:
+                return Response(entry['content'], status=entry['status'],
+                                headers={**entry['headers'], REPLAYED_HEADER: 'true'})
+
+            try:
+                response = method(view, request, *args, **kwargs)
+            except Exception:
+                cache.delete(cache_key)
+                raise
+            cache.set(cache_key, _entry(fingerprint, response, response.data),
+                      timeout=settings.IDEMPOTENCY_KEY_TTL)
+            return response
+        return wrapper
+    return decorator
+
+
+def aidempotent(namespace):
+    def decorator(method):
+        @wraps(method)
+        async def wrapper(view, request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return await method(view, request, *args, **kwargs)
+
+            cache_key = _cache_key(namespace, request.user.id, key)
+            fingerprint = _fingerprint(request, request.body)
+            entry = _stored(await cache.aget(cache_key), fingerprint)
+            if entry is None and not await cache.aadd(
+                    cache_key, {'fingerprint': fingerprint},
+                    timeout=settings.IDEMPOTENCY_IN_PROGRESS_TTL):
+                entry = _stored(await cache.aget(cache_key), fingerprint)
+            if entry is not None:
+                return HttpResponse(entry['content'], status=entry['status'],
+                                    content_type='application/json',
+                                    headers={**entry['headers'], REPLAYED_HEADER: 'true'})
+
+            try:
+                response = await method(view, request, *args, **kwargs)
+            except Exception:
+                await cache.adelete(cache_key)
+                raise
+            await cache.aset(cache_key, _entry(fingerprint, response, response.content),
+                             timeout=settings.IDEMPOTENCY_KEY_TTL)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,3 @@
+IDEMPOTENCY_KEY_REUSED = 'This Idempotency-Key was already used for a different request'
+IDEMPOTENCY_KEY_IN_PROGRESS = 'A request with this Idempotency-Key is still being processed'
+PRECONDITION_FAILED = 'The resource has changed since it was read, fetch it again and retry'
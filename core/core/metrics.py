@@ -0,0 +1,160 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+METRICS = {
+    'request_duration_seconds': ('Wall time of requests', DURATION_BUCKETS),
+    'db_queries': ('Database queries per request', QUERY_BUCKETS),
+    'db_duration_seconds': ('Database time per request', DURATION_BUCKETS),
+    'render_duration_seconds': ('Time spent rendering serialized responses', DURATION_BUCKETS),
+    'response_bytes': ('Size of response bodies', SIZE_BUCKETS),
+}
+PREFIX = 'habits_'
+
+_current = ContextVar('request_stats', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.requests = defaultdict(int)
+
+    def observe(self, labels, status, values):
+        with self.lock:
+            self.requests[(*labels, status)] += 1
+            for name, value in values.items():
+                key = (name, labels)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(METRICS[name][1])
+                self.histograms[key].observe(value)
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.requests.clear()
+
+    def render(self):
+        with self.lock:
+            lines = [f'# HELP {PREFIX}requests_total Requests by endpoint and status',
+                     f'# TYPE {PREFIX}requests_total counter']
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'{PREFIX}requests_total{{endpoint="{endpoint}",method="{method}",'
+                             f'status="{status}"}} {count}')
+            for name, (description, _) in METRICS.items():
+                lines += [f'# HELP {PREFIX}{name} {description}',
+                          f'# TYPE {PREFIX}{name} histogram']
+                for (metric, labels), histogram in sorted(self.histograms.items()):
+                    if metric == name:
+                        lines += _histogram_lines(PREFIX + name, labels, histogram)
+        return '\n'.join(lines) + '\n'
+
+
+def _histogram_lines(name, labels, histogram):
+    endpoint, method = labels
+    label = f'endpoint="{endpoint}",method="{method}"'
+    lines, total = [], 0
+    for bound, count in zip([*histogram.buckets, '+Inf'], histogram.counts):
+        total += count
+        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {total}')
+    lines.append(f'{name}_sum{{{label}}} {histogram.sum}')
+    lines.append(f'{name}_count{{{label}}} {total}')
+    return lines
+
+
+registry = Registry()
+
+_PLACEHOLDER_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_SAVEPOINT = re.compile(r'"s\d+_x\d+"')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def fingerprint(sql):
+    # Queries that differ only in their values or IN-list length share a fingerprint.
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    sql = _SAVEPOINT.sub('"?"', sql)
+    return _LITERAL.sub('?', sql)
+
+
+class RequestStats:
+    def __init__(self, keep_queries=False):
+        self.queries = 0
+        self.db_duration = 0
+        self.render_duration = 0
+        self.keep_queries = keep_queries
+        self.fingerprints = defaultdict(lambda: [0, 0])
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.db_duration += duration
+        if self.keep_queries:
+            entry = self.fingerprints[fingerprint(sql)]
+            entry[0] += 1
+            entry[1] += duration
+
+    def slowest_queries(self, limit=5):
+        return sorted(self.fingerprints.items(), key=lambda item: -item[1][1])[:limit]
+
+
+def start_request(keep_queries=False):
+    stats = RequestStats(keep_queries)
+    return stats, _current.set(stats)
+
+
+def current_stats():
+    return _current.get()
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, perf_counter() - started)
+
+
+def instrument(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def instrument_all():
+    for connection in connections.all():
+        instrument(connection)
+
+
+def _instrument_new_connection(sender, connection, **kwargs):
+    instrument(connection)
+
+
+# The request context travels into sync_to_async threads, so queries made by async views
+# are counted as long as their thread's connection carries the wrapper.
+connection_created.connect(_instrument_new_connection)
@@ -0,0 +1,127 @@
+import logging
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core import metrics
+from core.routers import apin_primary, pin_primary
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started, stats, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        self.finish(request, response, started, stats)
+        return response
+
+    async def __acall__(self, request):
+        started, stats, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        self.finish(request, response, started, stats)
+        return response
+
+    @staticmethod
+    def start():
+        metrics.instrument_all()
+        stats, token = metrics.start_request(keep_queries=settings.SLOW_REQUEST_MS > 0)
+        return perf_counter(), stats, token
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns, this times that rendering.
+        stats, render = metrics.current_stats(), response.render
+
+        def timed_render():
+            started = perf_counter()
+            try:
+                return render()
+            finally:
+                if stats is not None:
+                    stats.render_duration += perf_counter() - started
+
+        response.render = timed_render
+        return response
+
+    @staticmethod
+    def finish(request, response, started, stats):
+        duration = perf_counter() - started
+        match = request.resolver_match
+        endpoint = match.view_name if match else 'unmatched'
+        values = {
+            'request_duration_seconds': duration,
+            'db_queries': stats.queries,
+            'db_duration_seconds': stats.db_duration,
+            'render_duration_seconds': stats.render_duration,
+        }
+        if not response.streaming:
+            values['response_bytes'] = len(response.content)
+        metrics.registry.observe((endpoint, request.method), response.status_code, values)
+
+        if stats.keep_queries and duration * 1000 >= settings.SLOW_REQUEST_MS:
+            logger.warning(
+                'Slow request %s %s (%s): %.1f ms, %d queries in %.1f ms%s',
+                request.method, request.path, endpoint, duration * 1000, stats.queries,
+                stats.db_duration * 1000,
+                ''.join(f'\n  {count} x {total * 1000:.1f} ms: {sql}'
+                        for sql, (count, total) in stats.slowest_queries()))
+
+
+class ReadYourWritesMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self.is_write(request, response):
+            user_id = self.user_id(request)
+            if user_id is not None:
+                pin_primary(user_id)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self.is_write(request, response):
+            user_id = await sync_to_async(self.user_id)(request)
+            if user_id is not None:
+                await apin_primary(user_id)
+        return response
+
+    @staticmethod
+    def is_write(request, response):
+        return request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400
+
+    @staticmethod
+    def user_id(request):
+        # API views replace the session user with the one they authenticated.
+        user = getattr(request, 'user', None)
+        return user.id if user is not None and user.is_authenticated else None
@@ -0,0 +1,21 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    # Byte-for-byte compatible with JSONRenderer, falling back to it without orjson.
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or data is None or indent or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Dates, Decimals and lazy strings are encoded the way DRF encodes them.
+        content = orjson.dumps(
+            data, default=JSONEncoder().default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
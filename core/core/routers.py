@@ -0,0 +1,69 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+_reading = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def use_replica():
+    # Reads inside the block may be served by a replica; writes always go to the primary.
+    token = _reading.set(True)
+    try:
+        yield
+    finally:
+        _reading.reset(token)
+
+
+def _pin_key(user_id):
+    return f'primary-pin:{user_id}'
+
+
+def pin_primary(user_id):
+    cache.set(_pin_key(user_id), True, timeout=settings.READ_YOUR_WRITES_WINDOW)
+
+
+async def apin_primary(user_id):
+    await cache.aset(_pin_key(user_id), True, timeout=settings.READ_YOUR_WRITES_WINDOW)
+
+
+def replica_reads(method):
+    # Users who wrote recently keep reading from the primary until the replicas catch up.
+    @wraps(method)
+    def wrapper(view, request, *args, **kwargs):
+        if cache.get(_pin_key(request.user.id)):
+            return method(view, request, *args, **kwargs)
+        with use_replica():
+            return method(view, request, *args, **kwargs)
+    return wrapper
+
+
+def areplica_reads(method):
+    @wraps(method)
+    async def wrapper(view, request, *args, **kwargs):
+        if await cache.aget(_pin_key(request.user.id)):
+            return await method(view, request, *args, **kwargs)
+        with use_replica():
+            return await method(view, request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _reading.get() and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
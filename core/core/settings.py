@@ -2,6 +2,8 @@ import os
 from datetime import timedelta
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.environ.get('SECRET_KEY')
 DEBUG = bool(int(os.environ.get('DEBUG')))
@@ -32,6 +34,7 @@ SWAGGER_SETTINGS = {
     }
 }
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -39,9 +42,17 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReadYourWritesMiddleware',
 ]
 
 ROOT_URLCONF = os.environ.get('ROOT_URLCONF')
+HABIT_ASYNC_VIEWS = bool(int(os.environ.get('HABIT_ASYNC_VIEWS', 0)))
+HABIT_REMINDER_HOUR = int(os.environ.get('HABIT_REMINDER_HOUR', 9))
+HABIT_STATS_MAX_PERIODS = int(os.environ.get('HABIT_STATS_MAX_PERIODS', 100))
+
+REQUEST_METRICS = bool(int(os.environ.get('REQUEST_METRICS', 1)))
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 0))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
 
 TEMPLATES = [
     {
@@ -68,9 +79,48 @@ DATABASES = {
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASSWORD'),
         'HOST': os.environ.get('DB_HOST'),
-        'PORT': os.environ.get('DB_PORT')
+        'PORT': os.environ.get('DB_PORT'),
+        # Connections are reused across requests and pinged before reuse.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': bool(int(os.environ.get('DB_CONN_HEALTH_CHECKS', 1))),
+        # Required behind a transaction-pooling PgBouncer.
+        'DISABLE_SERVER_SIDE_CURSORS': bool(
+            int(os.environ.get('DB_DISABLE_SERVER_SIDE_CURSORS', 0))),
+    }
+}
+# The replica defaults to the primary's settings and only receives reads once configured.
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+    'USER': os.environ.get('DB_REPLICA_USER', DATABASES['default']['USER']),
+    'PASSWORD': os.environ.get('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+    'HOST': os.environ.get('DB_REPLICA_HOST', DATABASES['default']['HOST']),
+    'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+    'TEST': {'NAME': os.environ.get('DB_REPLICA_TEST_NAME')},
+}
+DATABASE_REPLICAS = ['replica'] if (
+    os.environ.get('DB_REPLICA_NAME') or os.environ.get('DB_REPLICA_HOST')) else []
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Seconds a user's reads stay on the primary after a write, covering replication lag.
+READ_YOUR_WRITES_WINDOW = int(os.environ.get('READ_YOUR_WRITES_WINDOW', 10))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND',
+                                  'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
+# Versioned responses, idempotency keys and throttle buckets must be shared by every worker.
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+if not DEBUG and CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES:
+    raise ImproperlyConfigured('CACHE_BACKEND must be a shared cache such as Redis in production')
+USER_CACHE_TIMEOUT = int(os.environ.get('USER_CACHE_TIMEOUT', 300))
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 3600))
+IDEMPOTENCY_IN_PROGRESS_TTL = int(os.environ.get('IDEMPOTENCY_IN_PROGRESS_TTL', 60))
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -86,12 +136,51 @@ AUTH_PASSWORD_VALIDATORS = [
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
     },
 ]
+# The first hasher encodes new passwords, and older hashes are upgraded on the next login.
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+HASHERS = {
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'accounts.hashers.ScryptPasswordHasher',
+    'argon2': 'accounts.hashers.Argon2PasswordHasher',
+}
+PASSWORD_HASHERS = [HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in HASHERS.items() if name != PASSWORD_HASHER
+]
+PASSWORD_SCRYPT_WORK_FACTOR = int(os.environ.get('PASSWORD_SCRYPT_WORK_FACTOR', 2 ** 14))
+PASSWORD_SCRYPT_BLOCK_SIZE = int(os.environ.get('PASSWORD_SCRYPT_BLOCK_SIZE', 8))
+PASSWORD_SCRYPT_PARALLELISM = int(os.environ.get('PASSWORD_SCRYPT_PARALLELISM', 1))
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 102400))
+PASSWORD_ARGON2_PARALLELISM = int(os.environ.get('PASSWORD_ARGON2_PARALLELISM', 8))
+
+# Rate limits as (burst capacity, requests per minute), enforced over a sliding window.
+THROTTLE_BUCKETS = {
+    'login_ip': (int(os.environ.get('THROTTLE_LOGIN_IP_CAPACITY', 30)),
+                 int(os.environ.get('THROTTLE_LOGIN_IP_PER_MINUTE', 10))),
+    'login_email': (int(os.environ.get('THROTTLE_LOGIN_EMAIL_CAPACITY', 5)),
+                    int(os.environ.get('THROTTLE_LOGIN_EMAIL_PER_MINUTE', 2))),
+    'password_reset_ip': (int(os.environ.get('THROTTLE_RESET_IP_CAPACITY', 10)),
+                          int(os.environ.get('THROTTLE_RESET_IP_PER_MINUTE', 2))),
+    'password_reset_email': (int(os.environ.get('THROTTLE_RESET_EMAIL_CAPACITY', 3)),
+                             int(os.environ.get('THROTTLE_RESET_EMAIL_PER_MINUTE', 1))),
+}
+
+# Production leaves out the HTML API browser and its per-response template rendering.
+BROWSABLE_API = bool(int(os.environ.get('BROWSABLE_API', DEBUG)))
+
 REST_FRAMEWORK = {
     'NON_FIELD_ERROR_KEY': 'error',
+    # Number of trusted reverse proxies in front of the app, read from X-Forwarded-For.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
 
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer'
+        'core.renderers.FastJSONRenderer',
+    ] + (['rest_framework.renderers.BrowsableAPIRenderer'] if BROWSABLE_API else []),
+
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -107,8 +196,15 @@ AUTH_USER_MODEL = 'accounts.User'
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
-    'REFRESH_TOKEN_LIFETIME': timedelta(days=30)
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=30),
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.CachedTokenRefreshSerializer'
 }
+BLACKLIST_BLOOM_SIZE = int(os.environ.get('BLACKLIST_BLOOM_SIZE', 2 ** 24))
+BLACKLIST_BLOOM_HASHES = int(os.environ.get('BLACKLIST_BLOOM_HASHES', 7))
+BLACKLIST_CACHE_SYNC_INTERVAL = int(os.environ.get('BLACKLIST_CACHE_SYNC_INTERVAL', 5))
+BLACKLIST_CACHE_SYNC_MARGIN = int(os.environ.get('BLACKLIST_CACHE_SYNC_MARGIN', 60))
+JWT_ACTIVE_CACHE_TTL = int(os.environ.get('JWT_ACTIVE_CACHE_TTL', 30))
+JWT_ACTIVE_CACHE_SIZE = int(os.environ.get('JWT_ACTIVE_CACHE_SIZE', 100000))
 
 LANGUAGE_CODE = os.environ.get('LANGUAGE_CODE')
 TIME_ZONE = os.environ.get('TIME_ZONE')
@@ -120,6 +216,11 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/uploads/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'uploads')
+AVATAR_THUMBNAIL_SIZES = [
+    int(size) for size in os.environ.get('AVATAR_THUMBNAIL_SIZES', '64,128,256').split(',')
+]
+AVATAR_WORKERS = int(os.environ.get('AVATAR_WORKERS', 2))
+AVATAR_PROCESSING_SYNC = bool(int(os.environ.get('AVATAR_PROCESSING_SYNC', 0)))
 
 DEFAULT_AUTO_FIELD = os.environ.get('DEFAULT_AUTO_FIELD')
 
@@ -129,3 +230,10 @@ EMAIL_PORT = '587'
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
+EMAIL_TIMEOUT = int(os.environ.get('EMAIL_TIMEOUT', 10))
+EMAIL_QUEUE_MAX_ATTEMPTS = int(os.environ.get('EMAIL_QUEUE_MAX_ATTEMPTS', 5))
+EMAIL_QUEUE_RETRY_DELAY = int(os.environ.get('EMAIL_QUEUE_RETRY_DELAY', 30))
+EMAIL_QUEUE_LEASE = int(os.environ.get('EMAIL_QUEUE_LEASE', 300))
+
+ACCOUNT_DELETION_BATCH_SIZE = int(os.environ.get('ACCOUNT_DELETION_BATCH_SIZE', 1000))
+ACCOUNT_DELETION_LEASE = int(os.environ.get('ACCOUNT_DELETION_LEASE', 300))
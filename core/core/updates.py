@@ -0,0 +1,18 @@
+def changed_fields(instance, values):
+    return [name for name, value in values.items() if getattr(instance, name) != value]
+
+
+def auto_now_fields(instance):
+    return [field.name for field in instance._meta.concrete_fields
+            if getattr(field, 'auto_now', False)]
+
+
+class DirtyFieldsMixin:
+    # Mixed into ModelSerializers so update() writes only the columns that changed.
+    def update(self, instance, validated_data):
+        changed = changed_fields(instance, validated_data)
+        for name in changed:
+            setattr(instance, name, validated_data[name])
+        if changed:
+            instance.save(update_fields=changed + auto_now_fields(instance))
+        return instance
@@ -8,6 +8,8 @@ from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
+from core.views import metrics
+
 schema_view = get_schema_view(
     openapi.Info(
         title='API',
@@ -24,8 +26,10 @@ schema_view = get_schema_view(
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics/', metrics, name='metrics'),
     path('auth/', include('accounts.urls')),
-    path('habit/', include('habit.urls')),
+    path('habit/async/', include(('habit.async_urls', 'habit'), namespace='async')),
+    path('habit/', include('habit.async_urls' if settings.HABIT_ASYNC_VIEWS else 'habit.urls')),
     path('api/api.json/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
     path('', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc')
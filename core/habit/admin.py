@@ -1,6 +1,12 @@
 from django.contrib import admin
 
-from habit.models import Habit, Tracking
+from habit.models import (
+    ActivityDay, FrequencyRollup, Habit, HabitSchedule, HabitStats, Tracking
+)
 
 admin.site.register(Habit)
 admin.site.register(Tracking)
+admin.site.register(HabitStats)
+admin.site.register(HabitSchedule)
+admin.site.register(ActivityDay)
+admin.site.register(FrequencyRollup)
@@ -0,0 +1,10 @@
+from django.urls import path, include
+
+from habit.async_views import AsyncHabitListView, AsyncHabitDetailView, AsyncCreateTrackingView
+
+urlpatterns = [
+    path('habits/', AsyncHabitListView.as_view(), name='habit-list'),
+    path('habits/<int:pk>/', AsyncHabitDetailView.as_view(), name='habit-detail'),
+    path('trackings/', AsyncCreateTrackingView.as_view(), name='create_tracking'),
+    path('', include('habit.urls')),
+]
@@ -0,0 +1,171 @@
+import json
+
+from django.http import HttpResponse, JsonResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException, AuthenticationFailed, NotAuthenticated, NotFound, ParseError
+)
+from rest_framework.pagination import Cursor
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from accounts.models import User
+from core.cache import abump_version, check_if_match, make_etag
+from core.idempotency import aidempotent
+from core.routers import areplica_reads
+from core.updates import changed_fields
+from habit import messages
+from habit.models import Habit, Tracking
+from habit.pagination import HabitCursorPagination
+from habit.serializers import (
+    HabitSerializer, BulkTrackingSerializer, habit_row_mapper, parse_projection
+)
+
+
+async def authenticate(request):
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = header and authentication.get_raw_token(header)
+    if not raw_token:
+        raise NotAuthenticated()
+
+    token = authentication.get_validated_token(raw_token)
+    try:
+        return await User.objects.aget(id=token[api_settings.USER_ID_CLAIM], is_active=True)
+    except User.DoesNotExist:
+        raise AuthenticationFailed('User not found', code='user_not_found')
+
+
+def error_response(exc):
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return JsonResponse(data, status=exc.status_code, safe=False)
+
+
+def conditional_response(request, data):
+    # The async counterpart of cache_user_response's tagging, so clients get the tag that
+    # If-Match expects on writes.
+    etag = make_etag(data)
+    if etag in request.headers.get('If-None-Match', ''):
+        return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    return JsonResponse(data, headers={'ETag': etag})
+
+
+class AsyncAPIView(View):
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.user = await authenticate(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            return error_response(exc)
+
+    @staticmethod
+    def parse_body(request):
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            raise ParseError(messages.INVALID_JSON)
+
+
+class AsyncHabitListView(AsyncAPIView):
+    @areplica_reads
+    async def get(self, request):
+        query = Request(request)
+        pagination = HabitCursorPagination()
+        page_size = pagination.get_page_size(query)
+        cursor = pagination.decode_cursor(query)
+        columns, to_representation = habit_row_mapper(parse_projection(request.GET.get('fields')))
+
+        habits = Habit.objects.filter(user_id=request.user.id).order_by('id')
+        if cursor and cursor.position is not None:
+            habits = habits.filter(id__gt=cursor.position)
+        habits = habits.values_list(*columns, 'id', named=True)
+        page = [habit async for habit in habits[:page_size + 1]]
+
+        pagination.base_url = request.build_absolute_uri()
+        next_link = None
+        if len(page) > page_size:
+            next_link = pagination.encode_cursor(
+                Cursor(offset=0, reverse=False, position=page[page_size - 1].id))
+        return conditional_response(request, {
+            'next': next_link, 'previous': None,
+            'results': to_representation(page[:page_size])
+        })
+
+    @aidempotent('habits')
+    async def post(self, request):
+        serializer = HabitSerializer(data=self.parse_body(request))
+        serializer.is_valid(raise_exception=True)
+        habit = await Habit.objects.acreate(user_id=request.user.id, **serializer.validated_data)
+        await abump_version(request.user.id)
+        return JsonResponse(HabitSerializer(habit).data, status=status.HTTP_201_CREATED)
+
+
+class AsyncHabitDetailView(AsyncAPIView):
+    @staticmethod
+    async def get_habit(request, pk):
+        try:
+            return await Habit.objects.aget(user_id=request.user.id, pk=pk)
+        except Habit.DoesNotExist:
+            raise NotFound()
+
+    @areplica_reads
+    async def get(self, request, pk):
+        columns, to_representation = habit_row_mapper()
+        try:
+            row = await Habit.objects.values_list(*columns).aget(user_id=request.user.id, pk=pk)
+        except Habit.DoesNotExist:
+            raise NotFound()
+        return conditional_response(request, to_representation([row])[0])
+
+    async def write(self, request, pk, partial):
+        habit = await self.get_habit(request, pk)
+        check_if_match(request, HabitSerializer(habit).data)
+        serializer = HabitSerializer(habit, data=self.parse_body(request), partial=partial)
+        serializer.is_valid(raise_exception=True)
+        changed = changed_fields(habit, serializer.validated_data)
+        if changed:
+            for field in changed:
+                setattr(habit, field, serializer.validated_data[field])
+            await habit.asave(update_fields=changed)
+            await abump_version(request.user.id)
+        data = HabitSerializer(habit).data
+        return JsonResponse(data, headers={'ETag': make_etag(data)})
+
+    @aidempotent('habits')
+    async def put(self, request, pk):
+        return await self.write(request, pk, partial=False)
+
+    @aidempotent('habits')
+    async def patch(self, request, pk):
+        return await self.write(request, pk, partial=True)
+
+    @aidempotent('habits')
+    async def delete(self, request, pk):
+        habit = await self.get_habit(request, pk)
+        check_if_match(request, HabitSerializer(habit).data)
+        await habit.adelete()
+        await abump_version(request.user.id)
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
+
+class AsyncCreateTrackingView(AsyncAPIView):
+    @aidempotent('trackings')
+    async def post(self, request):
+        serializer = BulkTrackingSerializer(data=self.parse_body(request))
+        serializer.is_valid(raise_exception=True)
+        owned = Habit.objects.filter(
+            id=serializer.validated_data['habit_id'], user_id=request.user.id)
+        if not await owned.aexists():
+            raise NotFound()
+
+        tracking = await Tracking.objects.acreate(**serializer.validated_data)
+        await abump_version(request.user.id)
+        return JsonResponse(BulkTrackingSerializer(tracking).data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,78 @@
+import csv
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from accounts.models import Profile
+from habit.models import Habit, Tracking
+from habit.serializers import HabitSerializer
+
+PROFILE_FIELDS = ['name', 'language', 'color_theme', 'created_at', 'updated_at']
+TRACKING_FIELDS = ['amount_of_days', 'done_date']
+CSV_COLUMNS = ['type', 'id', 'habit', *HabitSerializer.Meta.fields, *TRACKING_FIELDS,
+               *PROFILE_FIELDS]
+CONTENT_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def export_records(user_id, chunk_size=2000):
+    # Habits and trackings are streamed by two queries instead of prefetching per chunk,
+    # so memory stays flat however many trackings a single habit has.
+    profile = Profile.objects.filter(user_id=user_id).values(*PROFILE_FIELDS).first()
+    if profile:
+        yield {'type': 'profile', **profile}
+
+    habits = (Habit.objects.filter(user_id=user_id).order_by('id')
+              .values('id', *HabitSerializer.Meta.fields))
+    for habit in habits.iterator(chunk_size=chunk_size):
+        yield {'type': 'habit', **habit}
+
+    trackings = (Tracking.objects.filter(habit__user_id=user_id)
+                 .order_by('habit_id', 'done_date', 'id')
+                 .values('id', 'habit_id', *TRACKING_FIELDS))
+    for tracking in trackings.iterator(chunk_size=chunk_size):
+        tracking['habit'] = tracking.pop('habit_id')
+        yield {'type': 'tracking', **tracking}
+
+
+def to_ndjson(records):
+    for record in records:
+        yield json.dumps(record, cls=DjangoJSONEncoder) + '\n'
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def to_csv(records):
+    writer = csv.DictWriter(Echo(), fieldnames=CSV_COLUMNS)
+    yield writer.writeheader()
+    for record in records:
+        yield writer.writerow(record)
+
+
+WRITERS = {'ndjson': to_ndjson, 'csv': to_csv}
+
+
+def buffered(lines, size=64 * 1024):
+    buffer, length = [], 0
+    for line in lines:
+        buffer.append(line.encode())
+        length += len(buffer[-1])
+        if length >= size:
+            yield b''.join(buffer)
+            buffer, length = [], 0
+    yield b''.join(buffer)
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        yield compressor.compress(chunk)
+    yield compressor.flush()
+
+
+def export_stream(user_id, file_format='ndjson', compress=False):
+    chunks = buffered(WRITERS[file_format](export_records(user_id)))
+    return gzipped(chunks) if compress else chunks
@@ -0,0 +1,49 @@
+import base64
+
+from django.db.models import Count, DateField
+from django.db.models.functions import Trunc
+
+from habit.periods import period_start, next_period
+
+
+def bucket_starts(start, end, bucket):
+    starts = []
+    current = period_start(start, bucket)
+    while current <= end:
+        starts.append(current)
+        current = next_period(current, bucket)
+    return starts
+
+
+def count_trackings(trackings, start, end, bucket):
+    starts = bucket_starts(start, end, bucket)
+    positions = {day: index for index, day in enumerate(starts)}
+    rows = (
+        trackings.filter(done_date__range=(start, end)).order_by()
+        .annotate(bucket=Trunc('done_date', bucket, output_field=DateField()))
+        .values_list('bucket').annotate(count=Count('id'))
+    )
+
+    counts = [0] * len(starts)
+    for day, count in rows:
+        counts[positions[day]] = count
+    return starts, counts
+
+
+def _pack_bits(counts):
+    bits = bytearray((len(counts) + 7) // 8)
+    for index, count in enumerate(counts):
+        if count:
+            bits[index // 8] |= 0x80 >> (index % 8)
+    return base64.b64encode(bits).decode()
+
+
+ENCODERS = {
+    'array': lambda counts: counts,
+    'base64': lambda counts: base64.b64encode(bytes(min(count, 255) for count in counts)).decode(),
+    'bitmap': _pack_bits,
+}
+
+
+def encode(counts, encoding):
+    return ENCODERS[encoding](counts)
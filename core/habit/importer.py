@@ -0,0 +1,234 @@
+import csv
+import time
+from datetime import date
+
+from django.db import DatabaseError, transaction
+
+from core.cache import bump_version
+from core.parsers import loads
+from habit import messages
+from habit.models import Habit, HabitStats, Tracking
+from habit.rollups import record_habits
+from habit.schedule import refresh_schedules
+from habit.stats import record_trackings
+
+MAX_REPORTED_ERRORS = 1000
+
+
+def read_records(lines, file_format):
+    if file_format == 'csv':
+        for row in csv.DictReader(lines):
+            yield {key: value for key, value in row.items() if value not in ('', None)}
+        return
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield loads(line)
+        except ValueError:
+            yield None
+
+
+def _text(max_length=None):
+    def parse(value):
+        if not isinstance(value, str) or not value.strip() or (
+                max_length and len(value) > max_length):
+            raise ValueError(value)
+        return value
+    return parse
+
+
+def _integer(value):
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise ValueError(value)
+    return int(value)
+
+
+def _date(value):
+    return date.fromisoformat(value)
+
+
+def _choice(choices):
+    allowed = {value for value, _ in choices}
+
+    def parse(value):
+        if value not in allowed:
+            raise ValueError(value)
+        return value
+    return parse
+
+
+def _reference(value):
+    return str(_integer(value))
+
+
+HABIT_FIELDS = {
+    'title': _text(Habit._meta.get_field('title').max_length),
+    'description': _text(),
+    'number_of_repeats': _integer,
+    'execution_frequency': _choice(Habit.EXECUTION_FREQUENCY_CHOICE),
+    'start_date': _date,
+    'end_date': _date,
+}
+TRACKING_FIELDS = {
+    'habit': _reference,
+    'amount_of_days': _integer,
+    'done_date': _date,
+}
+
+
+def _clean_column(rows, name, parse):
+    # One field across the whole batch, so each parser is looked up and run in a tight loop.
+    for row in rows:
+        value = row['record'].get(name)
+        if value is None:
+            row['errors'].setdefault(name, []).append(messages.FIELD_REQUIRED)
+            continue
+        try:
+            row['values'][name] = parse(value)
+        except (TypeError, ValueError):
+            row['errors'].setdefault(name, []).append(
+                messages.INVALID_VALUE.format(value=value))
+
+
+def _clean(rows, fields):
+    for name, parse in fields.items():
+        _clean_column(rows, name, parse)
+
+
+class Importer:
+    def __init__(self, user_id, batch_size=1000):
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.habit_ids = {}
+        self.created = {'habits': 0, 'trackings': 0}
+        self.rows = 0
+        self.skipped = 0
+        self.error_count = 0
+        self.errors = []
+
+    def run(self, records):
+        started = time.monotonic()
+        # Each batch commits on its own, so locks are released batch by batch and a crash
+        # keeps the batches that were already imported.
+        batch = []
+        for record in records:
+            self.rows += 1
+            row = {'row': self.rows, 'record': record, 'values': {}, 'errors': {}}
+            if not isinstance(record, dict):
+                row.update(record={}, errors={'non_field_errors': [messages.INVALID_RECORD]})
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+        self.import_batch(batch)
+        return self.report(time.monotonic() - started)
+
+    def import_batch(self, batch):
+        habits, trackings = [], []
+        for row in batch:
+            record_type = row['record'].get('type')
+            if row['errors']:
+                self.fail(row)
+            elif record_type == 'habit':
+                habits.append(row)
+            elif record_type == 'tracking':
+                trackings.append(row)
+            elif record_type == 'profile':
+                self.skipped += 1
+            else:
+                row['errors']['type'] = [messages.UNKNOWN_RECORD_TYPE.format(type=record_type)]
+                self.fail(row)
+
+        self.save(self.prepare_habits(habits), self.create_habits)
+        self.save(self.prepare_trackings(trackings), self.create_trackings)
+
+    def prepare_habits(self, rows):
+        _clean(rows, HABIT_FIELDS)
+        valid = []
+        for row in rows:
+            values = row['values']
+            if not row['errors'] and values['end_date'] < values['start_date']:
+                row['errors']['end_date'] = [messages.END_BEFORE_START]
+            if row['errors']:
+                self.fail(row)
+            else:
+                valid.append(row)
+        return valid
+
+    def prepare_trackings(self, rows):
+        _clean(rows, TRACKING_FIELDS)
+        self.resolve_existing_habits(
+            {row['values']['habit'] for row in rows if 'habit' in row['values']})
+        valid = []
+        for row in rows:
+            habit_id = self.habit_ids.get(row['values'].get('habit'))
+            if 'habit' in row['values'] and habit_id is None:
+                row['errors']['habit'] = [messages.HABIT_NOT_FOUND]
+            if row['errors']:
+                self.fail(row)
+            else:
+                row['values']['habit'] = habit_id
+                valid.append(row)
+        return valid
+
+    def resolve_existing_habits(self, references):
+        # Trackings may also point at habits the user already has, looked up once per batch.
+        unknown = {int(reference) for reference in references - set(self.habit_ids)}
+        if unknown:
+            existing = Habit.objects.filter(user_id=self.user_id, id__in=unknown)
+            self.habit_ids.update(
+                (str(habit_id), habit_id) for habit_id in existing.values_list('id', flat=True))
+
+    def save(self, rows, create):
+        if not rows:
+            return
+        try:
+            with transaction.atomic():
+                create(rows)
+        except DatabaseError as error:
+            for row in rows:
+                row['errors'] = {'non_field_errors': [messages.BATCH_FAILED.format(error=error)]}
+                self.fail(row)
+        else:
+            bump_version(self.user_id)
+
+    def create_habits(self, rows):
+        habits = Habit.objects.bulk_create(
+            [Habit(user_id=self.user_id, **row['values']) for row in rows])
+        for row, habit in zip(rows, habits):
+            if 'id' in row['record']:
+                self.habit_ids[str(row['record']['id'])] = habit.id
+        HabitStats.objects.bulk_create([
+            HabitStats(habit=habit, execution_frequency=habit.execution_frequency)
+            for habit in habits
+        ])
+        refresh_schedules([habit.id for habit in habits])
+        record_habits((habit.execution_frequency, habit.number_of_repeats, 0) for habit in habits)
+        self.created['habits'] += len(habits)
+
+    def create_trackings(self, rows):
+        trackings = Tracking.objects.bulk_create(
+            [Tracking(habit_id=row['values'].pop('habit'), **row['values']) for row in rows])
+        record_trackings((tracking.habit_id, tracking.done_date, 1) for tracking in trackings)
+        self.created['trackings'] += len(trackings)
+
+    def fail(self, row):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row['row'], 'errors': row['errors']})
+
+    def report(self, seconds):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'skipped': self.skipped,
+            'error_count': self.error_count,
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(self.rows / seconds) if seconds else self.rows,
+        }
+
+
+def import_records(user_id, lines, file_format='ndjson', batch_size=1000):
+    return Importer(user_id, batch_size).run(read_records(lines, file_format))
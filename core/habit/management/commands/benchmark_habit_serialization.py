@@ -0,0 +1,36 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from habit.models import Habit
+from habit.serializers import HabitSerializer, habit_row_mapper
+
+
+class Command(BaseCommand):
+    help = 'Compare HabitSerializer(many=True) with the values_list row mapper on in-memory habits'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+
+    def handle(self, *args, **options):
+        columns, to_representation = habit_row_mapper()
+        for count in options['rows']:
+            habits = [
+                Habit(id=number, user_id=1, title=f'Habit {number}', description='Description',
+                      number_of_repeats=10, execution_frequency='day',
+                      start_date=date(2023, 1, 1), end_date=date(2023, 12, 31))
+                for number in range(count)
+            ]
+            rows = [tuple(getattr(habit, column) for column in columns) for habit in habits]
+
+            started = time.perf_counter()
+            HabitSerializer(habits, many=True).data
+            serializer = time.perf_counter() - started
+
+            started = time.perf_counter()
+            to_representation(rows)
+            mapper = time.perf_counter() - started
+
+            self.stdout.write(f'{count} rows: serializer {serializer * 1000:.1f} ms, '
+                              f'row mapper {mapper * 1000:.1f} ms ({serializer / mapper:.1f}x)')
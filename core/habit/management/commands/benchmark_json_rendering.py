@@ -0,0 +1,39 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import FastJSONRenderer
+from habit.models import Habit
+from habit.serializers import HabitSerializer
+
+
+class Command(BaseCommand):
+    help = 'Measure how long each JSON renderer takes to render a page of serialized habits'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--habits', type=int, default=10000)
+        parser.add_argument('--rounds', type=int, default=10)
+
+    def handle(self, *args, **options):
+        habits = [
+            Habit(id=number, user_id=1, title=f'Habit {number}', description='Description',
+                  number_of_repeats=10, execution_frequency='day',
+                  start_date=date(2023, 1, 1), end_date=date(2023, 12, 31))
+            for number in range(options['habits'])
+        ]
+        data = {'next': None, 'previous': None,
+                'results': HabitSerializer(habits, many=True).data}
+
+        timings = {}
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            started = time.perf_counter()
+            for _ in range(options['rounds']):
+                content = renderer.render(data)
+            timings[renderer] = (time.perf_counter() - started) / options['rounds']
+            self.stdout.write(f'{type(renderer).__name__}: {timings[renderer] * 1000:.1f} ms, '
+                              f'{len(content)} bytes')
+
+        baseline, fast = timings.values()
+        self.stdout.write(f'Speedup: {baseline / fast:.1f}x')
@@ -0,0 +1,54 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import User
+from habit.models import Habit
+from habit.views import BulkCreateTrackingView, CreateTrackingView
+
+
+class Command(BaseCommand):
+    help = ('Compare posting trackings one request at a time with one bulk request; '
+            'everything written is rolled back')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trackings', type=int, nargs='+', default=[10, 100, 1000])
+
+    def post(self, view, data):
+        request = APIRequestFactory().post('/', data, format='json')
+        force_authenticate(request, self.user)
+        return view(request)
+
+    def measure(self, count, send):
+        with transaction.atomic():
+            self.user = User.objects.create_user('benchmark@example.invalid', 'password')
+            habit = Habit.objects.create(
+                user=self.user, title='Benchmark', description='Description',
+                number_of_repeats=10, execution_frequency='day',
+                start_date=date(2023, 1, 1), end_date=date(2023, 12, 31))
+            items = [{'habit': habit.id, 'amount_of_days': 1,
+                      'done_date': (habit.start_date + timedelta(days=day % 365)).isoformat()}
+                     for day in range(count)]
+
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                send(items)
+                elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        return elapsed, len(queries)
+
+    def handle(self, *args, **options):
+        per_row_view = CreateTrackingView.as_view()
+        bulk_view = BulkCreateTrackingView.as_view()
+
+        for count in options['trackings']:
+            per_row, per_row_queries = self.measure(
+                count, lambda items: [self.post(per_row_view, item) for item in items])
+            bulk, bulk_queries = self.measure(count, lambda items: self.post(bulk_view, items))
+            self.stdout.write(
+                f'{count} trackings: per-row {per_row * 1000:.1f} ms ({per_row_queries} queries), '
+                f'bulk {bulk * 1000:.1f} ms ({bulk_queries} queries) ({per_row / bulk:.1f}x)')
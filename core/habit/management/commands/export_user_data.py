@@ -0,0 +1,29 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from habit.export import export_stream
+
+
+class Command(BaseCommand):
+    help = 'Stream the profile, habits and trackings of a user as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email')
+        parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--output', help='File to write to, standard output by default')
+
+    def handle(self, *args, **options):
+        user_id = User.objects.filter(email=options['email']).values_list('id', flat=True).first()
+        if user_id is None:
+            raise CommandError(f'User {options["email"]} does not exist')
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in export_stream(user_id, options['format'], options['gzip']):
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from habit.rollups import fold_rollups
+
+
+class Command(BaseCommand):
+    help = 'Fold the activity and habit deltas appended by requests into the rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new deltas')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds to sleep when there is nothing to fold')
+
+    def handle(self, *args, **options):
+        while True:
+            folded = fold_rollups(options['batch_size'])
+            if folded:
+                self.stdout.write(f'Folded {folded} deltas')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
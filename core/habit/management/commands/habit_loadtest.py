@@ -0,0 +1,55 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Fire concurrent requests at a running server and report requests per second and '
+        'latency percentiles. Run it once against the WSGI server (gunicorn core.wsgi) and once '
+        'against an ASGI server (e.g. uvicorn core.asgi) to compare them, using /habit/habits/ '
+        'for the sync views or /habit/async/habits/ for the async ones.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url')
+        parser.add_argument('--token', help='JWT access token sent as a Bearer header')
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=200)
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def fetch(self, url, headers, timeout):
+        started = time.perf_counter()
+        try:
+            with urlopen(Request(url, headers=headers), timeout=timeout) as response:
+                response.read()
+                ok = response.status < 400
+        except (URLError, OSError):
+            ok = False
+        return time.perf_counter() - started, ok
+
+    def handle(self, *args, **options):
+        headers = {'Authorization': f'Bearer {options["token"]}'} if options['token'] else {}
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(
+                lambda _: self.fetch(options['url'], headers, options['timeout']),
+                range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(1 for _, ok in results if not ok)
+        self.stdout.write(
+            f'requests: {len(results)}  errors: {errors}  concurrency: {options["concurrency"]}\n'
+            f'throughput: {len(results) / elapsed:.1f} req/s\n'
+            f'latency p50: {self.percentile(latencies, 50) * 1000:.1f} ms  '
+            f'p99: {self.percentile(latencies, 99) * 1000:.1f} ms  '
+            f'max: {latencies[-1] * 1000:.1f} ms'
+        )
+
+    @staticmethod
+    def percentile(values, percent):
+        return values[min(len(values) - 1, int(len(values) * percent / 100))]
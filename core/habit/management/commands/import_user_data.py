@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from habit.importer import import_records
+
+
+class Command(BaseCommand):
+    help = 'Import habits and trackings for a user from an NDJSON or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email')
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user_id = User.objects.filter(email=options['email']).values_list('id', flat=True).first()
+        if user_id is None:
+            raise CommandError(f'User {options["email"]} does not exist')
+
+        with open(options['path'], encoding='utf-8-sig', newline='') as lines:
+            report = import_records(user_id, lines, options['format'], options['batch_size'])
+
+        for error in report['errors']:
+            self.stderr.write(f'Row {error["row"]}: {error["errors"]}')
+        self.stdout.write(
+            f'{report["rows"]} rows in {report["seconds"]}s ({report["rows_per_second"]} rows/s): '
+            f'{report["created"]["habits"]} habits, {report["created"]["trackings"]} trackings '
+            f'created, {report["skipped"]} skipped, {report["error_count"]} errors')
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+
+from habit.models import (
+    ActivityDay, FrequencyRollup, Habit, RollupDelta, Tracking, UserActivityDay
+)
+
+
+class Command(BaseCommand):
+    help = 'Recompute the activity and frequency rollups from all habits and trackings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        with transaction.atomic():
+            # Pending deltas are already counted by the recomputation below.
+            for model in (RollupDelta, UserActivityDay, ActivityDay, FrequencyRollup):
+                model.objects.all().delete()
+
+            user_days = (Tracking.objects.order_by()
+                         .values_list('habit__user_id', 'done_date')
+                         .annotate(completions=Count('id')))
+            chunk = []
+            for user_id, day, completions in user_days.iterator(chunk_size=chunk_size):
+                chunk.append(UserActivityDay(user_id=user_id, day=day, completions=completions))
+                if len(chunk) == chunk_size:
+                    UserActivityDay.objects.bulk_create(chunk)
+                    chunk = []
+            UserActivityDay.objects.bulk_create(chunk)
+
+            ActivityDay.objects.bulk_create(
+                ActivityDay(day=day, active_users=active_users, completions=completions)
+                for day, active_users, completions in
+                UserActivityDay.objects.order_by().values_list('day')
+                .annotate(active_users=Count('id'), completions=Sum('completions')))
+            FrequencyRollup.objects.bulk_create(
+                FrequencyRollup(execution_frequency=frequency, habits=habits,
+                                target_repeats=target_repeats, completions=completions)
+                for frequency, habits, target_repeats, completions in
+                Habit.objects.order_by().values_list('execution_frequency')
+                .annotate(habits=Count('id'), target_repeats=Sum('number_of_repeats'),
+                          completions=Coalesce(Sum('stats__total_completions'), 0)))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt rollups of {ActivityDay.objects.count()} days'))
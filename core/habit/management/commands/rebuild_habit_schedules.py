@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from habit.models import Habit
+from habit.schedule import refresh_schedules
+
+
+class Command(BaseCommand):
+    help = 'Recompute the next due time of habits'
+
+    def add_arguments(self, parser):
+        parser.add_argument('habits', nargs='*', type=int, help='Habit ids, all habits by default')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        habit_ids = Habit.objects.order_by('id').values_list('id', flat=True)
+        if options['habits']:
+            habit_ids = habit_ids.filter(id__in=options['habits'])
+
+        chunk, rebuilt = [], 0
+        for habit_id in habit_ids.iterator(chunk_size=options['chunk_size']):
+            chunk.append(habit_id)
+            if len(chunk) == options['chunk_size']:
+                refresh_schedules(chunk)
+                rebuilt, chunk = rebuilt + len(chunk), []
+        refresh_schedules(chunk)
+        rebuilt += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt schedules of {rebuilt} habits'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from habit.models import Habit
+from habit.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild streak and completion statistics of habits from their trackings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('habits', nargs='*', type=int, help='Habit ids, all habits by default')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        habits = Habit.objects.order_by('id')
+        if options['habits']:
+            habits = habits.filter(id__in=options['habits'])
+
+        rebuilt = 0
+        for habit in habits.iterator(chunk_size=options['chunk_size']):
+            with transaction.atomic():
+                rebuild_stats(habit)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt statistics of {rebuilt} habits'))
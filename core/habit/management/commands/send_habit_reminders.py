@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from habit.schedule import send_due_reminders
+
+
+class Command(BaseCommand):
+    help = 'Queue reminders for habits that are due and move their schedules forward'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help='Keep ticking')
+        parser.add_argument('--interval', type=float, default=30,
+                            help='Seconds to sleep when nothing is due')
+
+    def handle(self, *args, **options):
+        while True:
+            schedules = send_due_reminders(options['batch_size'])
+            if schedules:
+                self.stdout.write(f'Processed {len(schedules)} due habits')
+            if not options['loop']:
+                break
+            if len(schedules) < options['batch_size']:
+                time.sleep(options['interval'])
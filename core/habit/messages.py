@@ -0,0 +1,14 @@
+UNKNOWN_FIELDS = 'Unknown fields: {fields}'
+HABIT_NOT_FOUND = 'Habit not found'
+EXPECTED_LIST = 'Expected a list of trackings'
+TOO_MANY_ITEMS = 'No more than {max_items} trackings can be sent at once'
+END_BEFORE_START = 'End date must not be earlier than start date'
+WINDOW_TOO_LONG = 'The window can span no more than {max_days} days'
+INVALID_JSON = 'Request body is not valid JSON'
+FIELD_REQUIRED = 'This field is required'
+INVALID_VALUE = 'Invalid value: {value}'
+UNKNOWN_RECORD_TYPE = 'Unknown record type: {type}'
+BATCH_FAILED = 'Batch could not be saved: {error}'
+INVALID_RECORD = 'Record is not a valid JSON object'
+REMINDER_SUBJECT = 'Reminder: {title}'
+REMINDER_BODY = 'It is time for your habit "{title}". Mark it as done once you have completed it.'
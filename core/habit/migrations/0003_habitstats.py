@@ -0,0 +1,82 @@
+# Generated by Django 4.2 on 2026-10-18 19:00
+
+from collections import Counter
+from itertools import groupby
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+from habit.periods import next_period, period_start
+
+
+def build_stats(apps, schema_editor):
+    # Existing habits get the stats later trackings update incrementally. Historical models
+    # have no methods, so the streaks are walked here.
+    Habit = apps.get_model('habit', 'Habit')
+    Tracking = apps.get_model('habit', 'Tracking')
+    HabitStats = apps.get_model('habit', 'HabitStats')
+    HabitPeriod = apps.get_model('habit', 'HabitPeriod')
+
+    frequencies = dict(Habit.objects.values_list('id', 'execution_frequency'))
+    counts = (Tracking.objects.order_by('habit_id').values_list('habit_id', 'done_date')
+              .annotate(count=Count('id')))
+    tracked = {}
+    for habit_id, rows in groupby(counts.iterator(chunk_size=10000), key=lambda row: row[0]):
+        periods = Counter()
+        for _, done_date, count in rows:
+            periods[period_start(done_date, frequencies[habit_id])] += count
+        tracked[habit_id] = periods
+
+    stats, rows = [], []
+    for habit_id, frequency in frequencies.items():
+        periods = tracked.get(habit_id, {})
+        current = longest = 0
+        previous = None
+        for start in sorted(periods):
+            following = previous and next_period(previous, frequency)
+            current = current + 1 if following == start else 1
+            longest = max(longest, current)
+            previous = start
+        stats.append(HabitStats(
+            habit_id=habit_id, execution_frequency=frequency,
+            total_completions=sum(periods.values()), current_streak=current,
+            longest_streak=longest, last_period=previous))
+        rows.extend(HabitPeriod(habit_id=habit_id, start=start, completions=completions)
+                    for start, completions in periods.items())
+    HabitStats.objects.bulk_create(stats, batch_size=1000)
+    HabitPeriod.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habit', '0002_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitStats',
+            fields=[
+                ('habit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='habit.habit', verbose_name='Habit')),
+                ('execution_frequency', models.CharField(choices=[('day', 'day'), ('week', 'week'), ('month', 'month')], max_length=10, verbose_name='Execution frequency')),
+                ('total_completions', models.IntegerField(default=0, verbose_name='Total completions')),
+                ('current_streak', models.IntegerField(default=0, verbose_name='Current streak')),
+                ('longest_streak', models.IntegerField(default=0, verbose_name='Longest streak')),
+                ('last_period', models.DateField(blank=True, null=True, verbose_name='Last completed period')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HabitPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateField(verbose_name='Period start')),
+                ('completions', models.IntegerField(verbose_name='Completions')),
+                ('habit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='periods', to='habit.habit', verbose_name='Habit')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('habit', 'start'), name='unique_habit_period')],
+            },
+        ),
+        migrations.RunPython(build_stats, migrations.RunPython.noop),
+    ]
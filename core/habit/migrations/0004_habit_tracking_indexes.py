@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habit', '0003_habitstats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['user', 'start_date', 'end_date'], name='habit_user_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tracking',
+            index=models.Index(fields=['habit', 'done_date'], name='tracking_habit_date_idx'),
+        ),
+    ]
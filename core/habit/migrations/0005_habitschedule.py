@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 19:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habit', '0004_habit_tracking_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitSchedule',
+            fields=[
+                ('habit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='schedule', serialize=False, to='habit.habit', verbose_name='Habit')),
+                ('next_due_at', models.DateTimeField(blank=True, null=True, verbose_name='Next due at')),
+                ('last_notified_at', models.DateTimeField(blank=True, null=True, verbose_name='Last notified at')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='habitschedule',
+            index=models.Index(condition=models.Q(('next_due_at__isnull', False)), fields=['next_due_at'], name='habit_schedule_due_idx'),
+        ),
+    ]
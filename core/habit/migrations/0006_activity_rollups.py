@@ -0,0 +1,54 @@
+# Generated by Django 4.2 on 2026-10-18 19:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('habit', '0005_habitschedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityDay',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False, verbose_name='Day')),
+                ('active_users', models.IntegerField(default=0, verbose_name='Active users')),
+                ('completions', models.IntegerField(default=0, verbose_name='Completions')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FrequencyRollup',
+            fields=[
+                ('execution_frequency', models.CharField(choices=[('day', 'day'), ('week', 'week'), ('month', 'month')], max_length=10, primary_key=True, serialize=False, verbose_name='Execution frequency')),
+                ('habits', models.IntegerField(default=0, verbose_name='Habits')),
+                ('target_repeats', models.BigIntegerField(default=0, verbose_name='Target repeats')),
+                ('completions', models.BigIntegerField(default=0, verbose_name='Completions')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserActivityDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Day')),
+                ('completions', models.IntegerField(default=0, verbose_name='Completions')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='habitstats',
+            index=models.Index(fields=['-longest_streak'], name='habit_stats_longest_idx'),
+        ),
+        migrations.AddField(
+            model_name='useractivityday',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_days', to=settings.AUTH_USER_MODEL, verbose_name='User'),
+        ),
+        migrations.AddConstraint(
+            model_name='useractivityday',
+            constraint=models.UniqueConstraint(fields=('user', 'day'), name='unique_user_activity_day'),
+        ),
+    ]
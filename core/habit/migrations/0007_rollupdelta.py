@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 19:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('habit', '0006_activity_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(null=True, verbose_name='Day')),
+                ('execution_frequency', models.CharField(choices=[('day', 'day'), ('week', 'week'), ('month', 'month')], max_length=10, verbose_name='Execution frequency')),
+                ('habits', models.IntegerField(default=0, verbose_name='Habits')),
+                ('target_repeats', models.BigIntegerField(default=0, verbose_name='Target repeats')),
+                ('completions', models.IntegerField(default=0, verbose_name='Completions')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+        ),
+    ]
@@ -1,6 +1,9 @@
-from django.db import models
+from collections import Counter
+
+from django.db import models, transaction
 
 from accounts.models import User
+from habit.periods import period_start, next_period, previous_period
 
 
 class Habit(models.Model):
@@ -16,6 +19,11 @@ class Habit(models.Model):
     start_date = models.DateField(verbose_name='Start date')
     end_date = models.DateField(verbose_name='End date')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'start_date', 'end_date'], name='habit_user_dates_idx'),
+        ]
+
     def __str__(self):
         return f'{self.user.email}: {self.title}'
 
@@ -26,5 +34,219 @@ class Tracking(models.Model):
     amount_of_days = models.IntegerField(verbose_name='Amount of days')
     done_date = models.DateField(verbose_name='Done date')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['habit', 'done_date'], name='tracking_habit_date_idx'),
+        ]
+
     def __str__(self):
         return f'{self.habit.title}: {self.done_date}'
+
+    # Stats are kept up to date by signals, which must commit or roll back with the row.
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            return super().delete(*args, **kwargs)
+
+
+class HabitPeriod(models.Model):
+    habit = models.ForeignKey(
+        Habit, on_delete=models.CASCADE, related_name='periods', verbose_name='Habit')
+    start = models.DateField(verbose_name='Period start')
+    completions = models.IntegerField(verbose_name='Completions')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['habit', 'start'], name='unique_habit_period'),
+        ]
+
+    def __str__(self):
+        return f'{self.habit_id} {self.start}: {self.completions}'
+
+
+class HabitStats(models.Model):
+    habit = models.OneToOneField(
+        Habit, on_delete=models.CASCADE, primary_key=True, related_name='stats',
+        verbose_name='Habit')
+    execution_frequency = models.CharField(
+        choices=Habit.EXECUTION_FREQUENCY_CHOICE, max_length=10,
+        verbose_name='Execution frequency')
+    total_completions = models.IntegerField(default=0, verbose_name='Total completions')
+    current_streak = models.IntegerField(default=0, verbose_name='Current streak')
+    longest_streak = models.IntegerField(default=0, verbose_name='Longest streak')
+    last_period = models.DateField(null=True, blank=True, verbose_name='Last completed period')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-longest_streak'], name='habit_stats_longest_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.habit_id}: {self.current_streak}/{self.longest_streak}'
+
+    # Takes {period start: (before, after)} once the period rows already hold the new counts.
+    def apply(self, counts):
+        self.total_completions = max(
+            self.total_completions + sum(after - before for before, after in counts.values()), 0)
+        added = sorted(start for start, (before, after) in counts.items() if before <= 0 < after)
+        removed = [start for start, (before, after) in counts.items() if after <= 0 < before]
+        if not removed and added and (self.last_period is None or added[0] > self.last_period):
+            for start in added:
+                self.add_period(start)
+        elif len(added) == 1 and not removed:
+            self.add_period(added[0])
+        elif len(removed) == 1 and not added:
+            self.remove_period(removed[0])
+        elif added or removed:
+            self.refresh_streaks()
+
+    # Resets the totals and streaks from (done_date, count) rows and returns the completions
+    # per period start.
+    def rebuild(self, counts):
+        periods = Counter()
+        for done_date, count in counts:
+            periods[period_start(done_date, self.execution_frequency)] += count
+        self.total_completions = sum(periods.values())
+        self.refresh_streaks(sorted(periods))
+        return periods
+
+    def stored_periods(self):
+        return HabitPeriod.objects.filter(habit_id=self.habit_id).values_list('start', flat=True)
+
+    def run(self, start, step):
+        # Length and far end of the consecutive stored periods from start on, walking by step.
+        starts = self.stored_periods()
+        if step is next_period:
+            starts = starts.filter(start__gte=start).order_by('start')
+        else:
+            starts = starts.filter(start__lte=start).order_by('-start')
+        length, end = 0, None
+        for stored in starts.iterator(chunk_size=100):
+            if stored != start:
+                break
+            length, end = length + 1, start
+            start = step(start, self.execution_frequency)
+        return length, end
+
+    def add_period(self, start):
+        # Only the run around the new period is walked, never the whole history.
+        if self.last_period is None or start > self.last_period:
+            following = (self.last_period
+                         and next_period(self.last_period, self.execution_frequency))
+            self.current_streak = self.current_streak + 1 if following == start else 1
+            self.last_period = start
+            self.longest_streak = max(self.longest_streak, self.current_streak)
+            return
+        left, _ = self.run(previous_period(start, self.execution_frequency), previous_period)
+        right, end = self.run(next_period(start, self.execution_frequency), next_period)
+        length = left + 1 + right
+        if (end or start) == self.last_period:
+            self.current_streak = length
+        self.longest_streak = max(self.longest_streak, length)
+
+    def remove_period(self, start):
+        left, _ = self.run(previous_period(start, self.execution_frequency), previous_period)
+        right, end = self.run(next_period(start, self.execution_frequency), next_period)
+        # Shortening the longest run, or losing the latest period with nothing right before it,
+        # can only be resolved by looking at the other runs.
+        if left + 1 + right >= self.longest_streak or (start == self.last_period and not left):
+            self.refresh_streaks()
+        elif start == self.last_period:
+            self.current_streak = left
+            self.last_period = previous_period(start, self.execution_frequency)
+        elif end == self.last_period:
+            self.current_streak = right
+
+    def refresh_streaks(self, starts=None):
+        if starts is None:
+            starts = self.stored_periods().order_by('start').iterator(chunk_size=1000)
+        current = longest = 0
+        previous = None
+        for start in starts:
+            following = previous and next_period(previous, self.execution_frequency)
+            current = current + 1 if following == start else 1
+            longest = max(longest, current)
+            previous = start
+        self.current_streak, self.longest_streak, self.last_period = current, longest, previous
+
+    def get_current_streak(self, today):
+        if self.last_period is None:
+            return 0
+        following = next_period(self.last_period, self.execution_frequency)
+        if following < period_start(today, self.execution_frequency):
+            return 0
+        return self.current_streak
+
+
+class HabitSchedule(models.Model):
+    habit = models.OneToOneField(
+        Habit, on_delete=models.CASCADE, primary_key=True, related_name='schedule',
+        verbose_name='Habit')
+    next_due_at = models.DateTimeField(null=True, blank=True, verbose_name='Next due at')
+    last_notified_at = models.DateTimeField(null=True, blank=True,
+                                            verbose_name='Last notified at')
+
+    class Meta:
+        indexes = [
+            # Finished habits have no due time and stay out of the index the tick scans.
+            models.Index(fields=['next_due_at'], name='habit_schedule_due_idx',
+                         condition=models.Q(next_due_at__isnull=False)),
+        ]
+
+    def __str__(self):
+        return f'{self.habit_id}: {self.next_due_at}'
+
+
+class UserActivityDay(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='activity_days', verbose_name='User')
+    day = models.DateField(verbose_name='Day')
+    completions = models.IntegerField(default=0, verbose_name='Completions')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='unique_user_activity_day'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.day} ({self.completions})'
+
+
+class ActivityDay(models.Model):
+    day = models.DateField(primary_key=True, verbose_name='Day')
+    active_users = models.IntegerField(default=0, verbose_name='Active users')
+    completions = models.IntegerField(default=0, verbose_name='Completions')
+
+    def __str__(self):
+        return f'{self.day}: {self.active_users} users, {self.completions} completions'
+
+
+class FrequencyRollup(models.Model):
+    execution_frequency = models.CharField(
+        choices=Habit.EXECUTION_FREQUENCY_CHOICE, max_length=10, primary_key=True,
+        verbose_name='Execution frequency')
+    habits = models.IntegerField(default=0, verbose_name='Habits')
+    target_repeats = models.BigIntegerField(default=0, verbose_name='Target repeats')
+    completions = models.BigIntegerField(default=0, verbose_name='Completions')
+
+    def __str__(self):
+        return f'{self.execution_frequency}: {self.completions}/{self.target_repeats}'
+
+
+class RollupDelta(models.Model):
+    # Appended on the request path and folded into the rollups by fold_habit_rollups.
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, null=True, related_name='+', verbose_name='User')
+    day = models.DateField(null=True, verbose_name='Day')
+    execution_frequency = models.CharField(
+        choices=Habit.EXECUTION_FREQUENCY_CHOICE, max_length=10,
+        verbose_name='Execution frequency')
+    habits = models.IntegerField(default=0, verbose_name='Habits')
+    target_repeats = models.BigIntegerField(default=0, verbose_name='Target repeats')
+    completions = models.IntegerField(default=0, verbose_name='Completions')
+
+    def __str__(self):
+        return f'{self.execution_frequency} {self.day}: {self.completions}'
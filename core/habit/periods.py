@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+
+def _week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def _next_month(start):
+    return (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def _previous_month(start):
+    return (start.replace(day=1) - timedelta(days=1)).replace(day=1)
+
+
+PERIOD_STARTS = {
+    'day': lambda day: day,
+    'week': _week_start,
+    'month': lambda day: day.replace(day=1),
+}
+
+NEXT_PERIODS = {
+    'day': lambda start: start + timedelta(days=1),
+    'week': lambda start: start + timedelta(weeks=1),
+    'month': _next_month,
+}
+
+PREVIOUS_PERIODS = {
+    'day': lambda start: start - timedelta(days=1),
+    'week': lambda start: start - timedelta(weeks=1),
+    'month': _previous_month,
+}
+
+
+def period_start(day, frequency):
+    return PERIOD_STARTS[frequency](day)
+
+
+def next_period(start, frequency):
+    return NEXT_PERIODS[frequency](start)
+
+
+def previous_period(start, frequency):
+    return PREVIOUS_PERIODS[frequency](start)
@@ -0,0 +1,149 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce
+
+from habit.models import (
+    ActivityDay, FrequencyRollup, Habit, HabitStats, RollupDelta, UserActivityDay
+)
+
+
+def _locked(queryset, key, keys, build):
+    def locked():
+        # A stable lock order keeps concurrent folding workers from deadlocking.
+        return {key(row): row for row in queryset.select_for_update().order_by('pk')}
+
+    rows = locked()
+    missing = set(keys) - set(rows)
+    if missing:
+        queryset.model.objects.bulk_create([build(key) for key in missing], ignore_conflicts=True)
+        rows = locked()
+    return rows
+
+
+def _add(model, deltas):
+    # Only the folding worker locks rollup rows, and it never rereads the trackings behind them.
+    deltas = {key: fields for key, fields in deltas.items() if any(fields.values())}
+    if not deltas:
+        return
+    rows = _locked(model.objects.filter(pk__in=deltas), lambda row: row.pk, deltas,
+                   lambda key: model(pk=key))
+    for key, fields in deltas.items():
+        for name, value in fields.items():
+            setattr(rows[key], name, getattr(rows[key], name) + value)
+    names = sorted({name for fields in deltas.values() for name in fields})
+    model.objects.bulk_update([rows[key] for key in deltas], names)
+
+
+def _lock_user_days(keys):
+    queryset = UserActivityDay.objects.filter(
+        user_id__in={user_id for user_id, _ in keys}, day__in={day for _, day in keys})
+    return _locked(queryset, lambda row: (row.user_id, row.day), keys,
+                   lambda key: UserActivityDay(user_id=key[0], day=key[1]))
+
+
+def record_activity(changes):
+    """Append (habit_id, done_date, delta) changes as deltas for the per-day rollups."""
+    habits = {
+        habit_id: (user_id, frequency) for habit_id, user_id, frequency in
+        Habit.objects.filter(id__in={habit_id for habit_id, _, _ in changes})
+        .values_list('id', 'user_id', 'execution_frequency')
+    }
+    deltas = Counter()
+    for habit_id, done_date, delta in changes:
+        if habit_id in habits:
+            deltas[(*habits[habit_id], done_date)] += delta
+    RollupDelta.objects.bulk_create([
+        RollupDelta(user_id=user_id, execution_frequency=frequency, day=day, completions=delta)
+        for (user_id, frequency, day), delta in deltas.items() if delta
+    ])
+
+
+def record_habits(habits, sign=1):
+    """Append (execution_frequency, number_of_repeats, completions) of added or removed habits."""
+    deltas = defaultdict(Counter)
+    for frequency, number_of_repeats, completions in habits:
+        deltas[frequency]['habits'] += sign
+        deltas[frequency]['target_repeats'] += sign * number_of_repeats
+        deltas[frequency]['completions'] += sign * completions
+    RollupDelta.objects.bulk_create([
+        RollupDelta(execution_frequency=frequency, **fields)
+        for frequency, fields in deltas.items() if any(fields.values())
+    ])
+
+
+def _fold_user_days(user_days):
+    days = defaultdict(Counter)
+    rows = _lock_user_days(user_days)
+    for key, delta in user_days.items():
+        row, before = rows[key], rows[key].completions
+        row.completions = max(before + delta, 0)
+        days[row.day]['completions'] += row.completions - before
+        days[row.day]['active_users'] += (row.completions > 0) - (before > 0)
+    UserActivityDay.objects.bulk_update([rows[key] for key in user_days], ['completions'])
+    _add(ActivityDay, days)
+
+
+def fold_rollups(batch_size=1000):
+    """Fold the oldest pending deltas into the rollups and return how many were folded."""
+    with transaction.atomic():
+        deltas = list(RollupDelta.objects.select_for_update(skip_locked=True)
+                      .order_by('id')[:batch_size])
+        user_days, frequencies = Counter(), defaultdict(Counter)
+        for delta in deltas:
+            if delta.day is not None:
+                user_days[delta.user_id, delta.day] += delta.completions
+            for name in ('habits', 'target_repeats', 'completions'):
+                frequencies[delta.execution_frequency][name] += getattr(delta, name)
+        user_days = {key: delta for key, delta in user_days.items() if delta}
+
+        if user_days:
+            _fold_user_days(user_days)
+        _add(FrequencyRollup, frequencies)
+        RollupDelta.objects.filter(id__in=[delta.id for delta in deltas]).delete()
+    return len(deltas)
+
+
+def habit_completions(habit_id):
+    return HabitStats.objects.filter(habit_id=habit_id).values_list(
+        'total_completions', flat=True).first() or 0
+
+
+def user_habits(user_id):
+    return (Habit.objects.filter(user_id=user_id).order_by()
+            .values('execution_frequency')
+            .annotate(habits=Count('id'), target_repeats=Sum('number_of_repeats'),
+                      completions=Coalesce(Sum('stats__total_completions'), 0))
+            .values_list('execution_frequency', 'habits', 'target_repeats', 'completions'))
+
+
+def forget_user_habits(user_id):
+    RollupDelta.objects.bulk_create([
+        RollupDelta(execution_frequency=frequency, habits=-habits,
+                    target_repeats=-target_repeats, completions=-completions)
+        for frequency, habits, target_repeats, completions in user_habits(user_id)
+    ])
+
+
+def top_streaks(limit):
+    return list(
+        HabitStats.objects.filter(longest_streak__gt=0, habit__user__is_active=True)
+        .order_by('-longest_streak')
+        .values('longest_streak', 'execution_frequency', name=F('habit__user__profile__name'))
+        [:limit])
+
+
+def completion_rates():
+    return [
+        {'execution_frequency': rollup.execution_frequency, 'habits': rollup.habits,
+         'completions': rollup.completions,
+         'completion_rate': round(rollup.completions / rollup.target_repeats, 4)
+         if rollup.target_repeats else 0}
+        for rollup in FrequencyRollup.objects.filter(habits__gt=0).order_by('execution_frequency')
+    ]
+
+
+def daily_activity(start, end):
+    return list(ActivityDay.objects.filter(day__range=(start, end)).order_by('day')
+                .values('day', 'active_users', 'completions'))
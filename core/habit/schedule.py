@@ -0,0 +1,81 @@
+from datetime import datetime, time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.send_email import SendEmail
+from habit import messages
+from habit.models import Habit, HabitSchedule, HabitStats
+from habit.periods import period_start, next_period
+
+
+def due_at(day):
+    moment = datetime.combine(day, time(settings.HABIT_REMINDER_HOUR))
+    return timezone.make_aware(moment) if settings.USE_TZ else moment
+
+
+def next_due_day(habit, stats, today):
+    # The first day from today on whose period still lacks a completion, None once the
+    # habit is over or every repeat is done.
+    stats = stats or HabitStats(execution_frequency=habit.execution_frequency)
+    if stats.total_completions >= habit.number_of_repeats:
+        return None
+    start = period_start(max(today, habit.start_date), habit.execution_frequency)
+    if stats.last_period is not None and stats.last_period >= start:
+        start = next_period(start, habit.execution_frequency)
+    day = max(start, habit.start_date)
+    return day if day <= habit.end_date else None
+
+
+def _local_day(moment):
+    return timezone.localdate(moment) if timezone.is_aware(moment) else moment.date()
+
+
+def _after_notified(habit, last_notified_at, today):
+    # A period that already got its reminder is never due again.
+    if last_notified_at is None:
+        return today
+    notified = period_start(_local_day(last_notified_at), habit.execution_frequency)
+    return max(today, next_period(notified, habit.execution_frequency))
+
+
+def refresh_schedules(habit_ids):
+    today = timezone.localdate()
+    schedules = []
+    for habit in Habit.objects.filter(id__in=habit_ids).select_related('stats', 'schedule'):
+        schedule = getattr(habit, 'schedule', None)
+        start = _after_notified(habit, schedule and schedule.last_notified_at, today)
+        day = next_due_day(habit, getattr(habit, 'stats', None), start)
+        schedules.append(HabitSchedule(habit_id=habit.id, next_due_at=day and due_at(day)))
+    HabitSchedule.objects.bulk_create(
+        schedules, update_conflicts=True, unique_fields=['habit'], update_fields=['next_due_at'])
+
+
+def send_due_reminders(batch_size=500, now=None):
+    now = now or timezone.now()
+    with transaction.atomic():
+        schedules = list(
+            HabitSchedule.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(next_due_at__lte=now)
+            .select_related('habit__user', 'habit__stats')
+            .order_by('next_due_at')[:batch_size])
+
+        reminders = []
+        for schedule in schedules:
+            habit = schedule.habit
+            due_day = _local_day(schedule.next_due_at)
+            if habit.user.is_active:
+                reminders.append((
+                    habit.user.email, messages.REMINDER_SUBJECT.format(title=habit.title),
+                    messages.REMINDER_BODY.format(title=habit.title),
+                    f'habit-reminder:{habit.id}:{due_day.isoformat()}'))
+
+            start = _after_notified(habit, now, due_day)
+            day = next_due_day(habit, getattr(habit, 'stats', None), start)
+            schedule.next_due_at = day and due_at(day)
+            schedule.last_notified_at = now
+
+        SendEmail.send_many(reminders)
+        HabitSchedule.objects.bulk_update(schedules, ['next_due_at', 'last_notified_at'])
+    return schedules
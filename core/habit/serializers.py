@@ -1,9 +1,18 @@
-from rest_framework import serializers
+from datetime import date
+from functools import lru_cache
 
-from habit.models import Habit, Tracking
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 
+from core.updates import DirtyFieldsMixin
+from habit import messages
+from habit.heatmap import ENCODERS
+from habit.models import Habit, HabitPeriod, HabitStats, Tracking
 
-class HabitSerializer(serializers.ModelSerializer):
+
+class HabitSerializer(DirtyFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Habit
         fields = [
@@ -11,8 +20,132 @@ class HabitSerializer(serializers.ModelSerializer):
             'execution_frequency', 'start_date', 'end_date'
         ]
 
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+
+def parse_projection(value):
+    fields = [field for field in (value or '').split(',') if field]
+    unknown = set(fields) - set(HabitSerializer.Meta.fields)
+    if unknown:
+        raise serializers.ValidationError(
+            {'fields': messages.UNKNOWN_FIELDS.format(fields=', '.join(sorted(unknown)))})
+    return fields or None
+
+
+def _converter(field):
+    # Text and integer columns already come back in their JSON form.
+    if type(field) in (serializers.CharField, serializers.IntegerField):
+        return None
+    if type(field) is serializers.DateField and (
+            getattr(field, 'format', api_settings.DATE_FORMAT) or '').lower() == ISO_8601:
+        return date.isoformat
+    return field.to_representation
+
+
+@lru_cache(maxsize=None)
+def _row_mapper(fields):
+    serializer_fields = HabitSerializer(fields=fields).fields
+    names = list(serializer_fields)
+    converters = [
+        (index, converter) for index, converter in enumerate(map(
+            _converter, serializer_fields.values())) if converter is not None
+    ]
+
+    def to_representation(rows):
+        data = []
+        for row in rows:
+            if converters:
+                row = list(row)
+                for index, convert in converters:
+                    if row[index] is not None:
+                        row[index] = convert(row[index])
+            # zip() stops at the serialized fields and ignores trailing columns such as id.
+            data.append(dict(zip(names, row)))
+        return data
+
+    return [field.source for field in serializer_fields.values()], to_representation
+
+
+def habit_row_mapper(fields=None):
+    # Same output as HabitSerializer(many=True) for rows fetched with values_list(*columns).
+    return _row_mapper(tuple(sorted(fields)) if fields else None)
+
 
 class TrackingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tracking
         fields = ['habit', 'amount_of_days', 'done_date']
+
+
+class BulkTrackingSerializer(serializers.ModelSerializer):
+    habit = serializers.IntegerField(source='habit_id')
+
+    class Meta:
+        model = Tracking
+        fields = ['habit', 'amount_of_days', 'done_date']
+
+
+class HabitStatsSerializer(serializers.ModelSerializer):
+    current_streak = serializers.SerializerMethodField()
+    number_of_repeats = serializers.IntegerField(source='habit.number_of_repeats')
+    progress = serializers.SerializerMethodField()
+    periods = serializers.SerializerMethodField()
+
+    class Meta:
+        model = HabitStats
+        fields = [
+            'execution_frequency', 'current_streak', 'longest_streak', 'total_completions',
+            'number_of_repeats', 'progress', 'periods'
+        ]
+
+    def get_current_streak(self, obj):
+        return obj.get_current_streak(timezone.localdate())
+
+    def get_periods(self, obj):
+        # Only the most recent periods; the heatmap endpoint covers any older range.
+        recent = list(HabitPeriod.objects.filter(habit_id=obj.habit_id).order_by('-start')
+                      .values_list('start', 'completions')[:settings.HABIT_STATS_MAX_PERIODS])
+        return {start.isoformat(): completions for start, completions in reversed(recent)}
+
+    def get_progress(self, obj):
+        if obj.habit.number_of_repeats <= 0:
+            return 0
+        return round(obj.total_completions / obj.habit.number_of_repeats, 4)
+
+
+class HeatmapQuerySerializer(serializers.Serializer):
+    MAX_DAYS = 3660
+
+    start = serializers.DateField()
+    end = serializers.DateField()
+    bucket = serializers.ChoiceField(
+        choices=[choice for choice, _ in Habit.EXECUTION_FREQUENCY_CHOICE], default='day')
+    encoding = serializers.ChoiceField(choices=list(ENCODERS), default='array')
+
+    def validate(self, attrs):
+        if attrs['end'] < attrs['start']:
+            raise serializers.ValidationError(messages.END_BEFORE_START)
+        if (attrs['end'] - attrs['start']).days >= self.MAX_DAYS:
+            raise serializers.ValidationError(
+                messages.WINDOW_TOO_LONG.format(max_days=self.MAX_DAYS))
+        return attrs
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    file_format = serializers.ChoiceField(choices=['ndjson', 'csv'], default='ndjson')
+    gzip = serializers.BooleanField(default=False)
+
+
+class ImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    file_format = serializers.ChoiceField(choices=['ndjson', 'csv'], default='ndjson')
+
+
+class LeaderboardQuerySerializer(serializers.Serializer):
+    days = serializers.IntegerField(min_value=1, max_value=366, default=30)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
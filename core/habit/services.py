@@ -0,0 +1,47 @@
+from django.db import transaction
+
+from habit import messages
+from habit.models import Habit, Tracking
+from habit.serializers import BulkTrackingSerializer
+from habit.stats import record_trackings
+
+
+def _error(index, errors):
+    return {'index': index, 'status': 'error', 'errors': errors}
+
+
+def _validate(items):
+    serializers = [BulkTrackingSerializer(data=item) for item in items]
+    return [(serializer, serializer.is_valid()) for serializer in serializers]
+
+
+def _owned_habit_ids(user_id, validated):
+    habit_ids = {serializer.validated_data['habit_id'] for serializer, valid in validated if valid}
+    return set(
+        Habit.objects.filter(user_id=user_id, id__in=habit_ids).values_list('id', flat=True))
+
+
+def bulk_create_trackings(user_id, items, batch_size=500):
+    validated = _validate(items)
+    owned = _owned_habit_ids(user_id, validated)
+
+    results = [None] * len(items)
+    pending = []
+    for index, (serializer, valid) in enumerate(validated):
+        if not valid:
+            results[index] = _error(index, serializer.errors)
+        elif serializer.validated_data['habit_id'] not in owned:
+            results[index] = _error(index, {'habit': [messages.HABIT_NOT_FOUND]})
+        else:
+            pending.append((index, Tracking(**serializer.validated_data)))
+
+    with transaction.atomic():
+        for start in range(0, len(pending), batch_size):
+            Tracking.objects.bulk_create(
+                [tracking for _, tracking in pending[start:start + batch_size]])
+        record_trackings(
+            (tracking.habit_id, tracking.done_date, 1) for _, tracking in pending)
+
+    for index, tracking in pending:
+        results[index] = {'index': index, 'status': 'created', 'id': tracking.id}
+    return results
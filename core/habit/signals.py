@@ -0,0 +1,73 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from habit.models import Habit, HabitStats, Tracking
+from habit.rollups import habit_completions, record_habits
+from habit.schedule import refresh_schedules
+from habit.stats import record_trackings, rebuild_stats
+
+
+@receiver(pre_save, sender=Tracking)
+def remember_tracking_date(sender, instance, **kwargs):
+    if instance.pk is not None and not instance._state.adding:
+        instance._previous = (
+            Tracking.objects.filter(pk=instance.pk).values_list('habit_id', 'done_date').first())
+
+
+@receiver(post_save, sender=Tracking)
+def count_tracking(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    changes = [(instance.habit_id, instance.done_date, 1)] if created else []
+    if previous and previous != (instance.habit_id, instance.done_date):
+        changes = [(*previous, -1), (instance.habit_id, instance.done_date, 1)]
+    record_trackings(changes)
+
+
+@receiver(post_delete, sender=Tracking)
+def uncount_tracking(sender, instance, origin=None, **kwargs):
+    # Trackings removed by a habit or account cascade take their stats with them.
+    if getattr(origin, 'model', type(origin)) is Tracking:
+        record_trackings([(instance.habit_id, instance.done_date, -1)])
+
+
+@receiver(post_save, sender=Habit)
+def rebuild_on_frequency_change(sender, instance, created, **kwargs):
+    if created:
+        # A new habit has no trackings yet, so its stats start empty.
+        HabitStats.objects.create(habit=instance, execution_frequency=instance.execution_frequency)
+        return
+    stale = HabitStats.objects.filter(habit=instance).exclude(
+        execution_frequency=instance.execution_frequency)
+    if stale.exists():
+        rebuild_stats(instance)
+
+
+@receiver(pre_save, sender=Habit)
+def remember_habit_target(sender, instance, **kwargs):
+    if instance.pk is not None and not instance._state.adding:
+        instance._previous = Habit.objects.filter(pk=instance.pk).values_list(
+            'execution_frequency', 'number_of_repeats').first()
+
+
+@receiver(post_save, sender=Habit)
+def count_habit(sender, instance, created, **kwargs):
+    current = (instance.execution_frequency, instance.number_of_repeats)
+    if created:
+        record_habits([(*current, 0)])
+        return
+    previous = getattr(instance, '_previous', None)
+    if previous and previous != current:
+        completions = habit_completions(instance.id)
+        record_habits([(*previous, completions)], sign=-1)
+        record_habits([(*current, completions)])
+
+
+@receiver(pre_delete, sender=Habit)
+def uncount_habit(sender, instance, **kwargs):
+    record_habits([(instance.execution_frequency, instance.number_of_repeats,
+                    habit_completions(instance.id))], sign=-1)
+
+
+@receiver(post_save, sender=Habit)
+def reschedule_habit(sender, instance, **kwargs):
+    refresh_schedules([instance.id])
@@ -0,0 +1,102 @@
+from collections import Counter, defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q
+
+from habit.models import Habit, HabitPeriod, HabitStats, Tracking
+from habit.periods import period_start
+from habit.rollups import record_activity
+from habit.schedule import refresh_schedules
+
+STATS_FIELDS = ['total_completions', 'current_streak', 'longest_streak', 'last_period']
+
+
+def _build_missing(habit_ids):
+    # Stats are built from the whole history the first time a habit is touched, and that
+    # history already holds the changes being recorded. A habit built concurrently by another
+    # request gets the changes applied to that row instead.
+    built = set()
+    for habit in Habit.objects.filter(id__in=habit_ids):
+        try:
+            with transaction.atomic():
+                rebuild_stats(habit, force_insert=True)
+        except IntegrityError:
+            continue
+        built.add(habit.id)
+    return built
+
+
+def _lock_stats(habit_ids):
+    stats = {item.habit_id: item
+             for item in HabitStats.objects.select_for_update().filter(habit_id__in=habit_ids)}
+    missing = set(habit_ids) - set(stats)
+    built = _build_missing(missing) if missing else set()
+    if missing - built:
+        stats.update({item.habit_id: item for item in
+                      HabitStats.objects.select_for_update().filter(habit_id__in=missing - built)})
+    return stats, built
+
+
+def _write_periods(deltas):
+    # Only the periods that changed are read and written, never the rest of the history.
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return {}
+    before = {
+        (habit_id, start): completions for habit_id, start, completions in
+        HabitPeriod.objects.filter(habit_id__in={habit_id for habit_id, _ in deltas},
+                                   start__in={start for _, start in deltas})
+        .values_list('habit_id', 'start', 'completions')
+    }
+    counts, upserts, emptied = defaultdict(dict), [], []
+    for (habit_id, start), delta in deltas.items():
+        count = before.get((habit_id, start), 0)
+        counts[habit_id][start] = (count, count + delta)
+        if count + delta > 0:
+            upserts.append(HabitPeriod(habit_id=habit_id, start=start, completions=count + delta))
+        elif (habit_id, start) in before:
+            emptied.append(Q(habit_id=habit_id, start=start))
+    HabitPeriod.objects.bulk_create(
+        upserts, update_conflicts=True, unique_fields=['habit', 'start'],
+        update_fields=['completions'])
+    if emptied:
+        HabitPeriod.objects.filter(reduce(or_, emptied)).delete()
+    return counts
+
+
+def record_trackings(changes):
+    """Apply (habit_id, done_date, delta) changes to the stored stats of each habit."""
+    changes = list(changes)
+    habit_ids = {habit_id for habit_id, _, _ in changes}
+    if not habit_ids:
+        return
+
+    with transaction.atomic():
+        stats, built = _lock_stats(habit_ids)
+        deltas = Counter()
+        for habit_id, done_date, delta in changes:
+            if habit_id in stats:
+                frequency = stats[habit_id].execution_frequency
+                deltas[habit_id, period_start(done_date, frequency)] += delta
+        counts = _write_periods(deltas)
+        for habit_id, item in stats.items():
+            item.apply(counts.get(habit_id, {}))
+        HabitStats.objects.bulk_update(stats.values(), STATS_FIELDS)
+        refresh_schedules(list(stats) + list(built))
+        record_activity(changes)
+
+
+def rebuild_stats(habit, force_insert=False):
+    stats = HabitStats(habit=habit, execution_frequency=habit.execution_frequency)
+    periods = stats.rebuild(
+        Tracking.objects.filter(habit=habit).order_by()
+        .values_list('done_date').annotate(count=Count('id')))
+    stats.save(force_insert=force_insert)
+    HabitPeriod.objects.filter(habit=habit).delete()
+    HabitPeriod.objects.bulk_create([
+        HabitPeriod(habit=habit, start=start, completions=completions)
+        for start, completions in periods.items()
+    ])
+    return stats
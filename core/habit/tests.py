@@ -1,3 +1,1229 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import io
+import itertools
+import json
+import random
+import re
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Count
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from accounts.authentication import forget_user
+from core import metrics
+from core.cache import make_etag
+from core.renderers import FastJSONRenderer
+from accounts.models import OutgoingEmail, Profile, User
+from habit import rollups
+from habit.models import (
+    Habit, HabitPeriod, HabitSchedule, HabitStats, RollupDelta, Tracking
+)
+from habit.importer import Importer, import_records
+from habit.schedule import due_at, send_due_reminders
+from habit.serializers import HabitSerializer
+
+
+def create_habits(user, count):
+    Habit.objects.bulk_create([
+        Habit(user=user, title=f'Habit {number}', description='Description',
+              number_of_repeats=10, execution_frequency='day',
+              start_date=date(2023, 1, 1), end_date=date(2023, 12, 31))
+        for number in range(count)
+    ])
+
+
+class HabitListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('user@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('habit-list')
+
+    def test_list_is_cursor_paginated(self):
+        create_habits(self.user, 60)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 50)
+        self.assertIsNotNone(response.data['next'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertIsNone(response.data['next'])
+
+    def test_list_query_count_does_not_grow_with_table(self):
+        create_habits(self.user, 10)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+        create_habits(self.user, 1000)
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_fields_projection(self):
+        create_habits(self.user, 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'fields': 'title,end_date'})
+        self.assertNotIn('description', queries[0]['sql'])
+        self.assertEqual(response.data['results'],
+                         [{'title': 'Habit 0', 'end_date': '2023-12-31'}])
+
+    def test_unknown_projection_field(self):
+        response = self.client.get(self.url, {'fields': 'title,user'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BulkCreateTrackingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        create_habits(self.user, 1)
+        self.habit = Habit.objects.get()
+        self.url = reverse('bulk_create_tracking')
+
+    def trackings(self, count):
+        return [{'habit': self.habit.id, 'amount_of_days': 1, 'done_date': '2023-05-01'}
+                for _ in range(count)]
+
+    def test_bulk_create(self):
+        response = self.client.post(self.url, self.trackings(3), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Tracking.objects.count(), 3)
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['created'] * 3)
+
+    def test_ndjson_body(self):
+        body = '\n'.join(json.dumps(item) for item in self.trackings(2))
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Tracking.objects.count(), 2)
+
+    def test_reports_errors_per_item(self):
+        other = User.objects.create_user('other@example.com', 'password')
+        create_habits(other, 1)
+        foreign = Habit.objects.get(user=other)
+        items = self.trackings(1) + [
+            {'habit': foreign.id, 'amount_of_days': 1, 'done_date': '2023-05-01'},
+            {'habit': self.habit.id, 'amount_of_days': 1, 'done_date': 'yesterday'},
+        ]
+
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['created', 'error', 'error'])
+        self.assertIn('habit', response.data['results'][1]['errors'])
+        self.assertIn('done_date', response.data['results'][2]['errors'])
+        self.assertEqual(Tracking.objects.count(), 1)
+
+    def test_rejects_non_list_body(self):
+        response = self.client.post(self.url, self.trackings(1)[0], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_query_count_compared_with_per_row_path(self):
+        with CaptureQueriesContext(connection) as per_row:
+            for item in self.trackings(50):
+                self.client.post(reverse('create_tracking'), item, format='json')
+
+        with CaptureQueriesContext(connection) as bulk:
+            self.client.post(self.url, self.trackings(50), format='json')
+
+        self.assertGreaterEqual(len(per_row), 50 * 3)
+        # Stats, schedules and rollups are each written once per request, not per item.
+        self.assertLessEqual(len(bulk), 25)
+
+    def test_benchmark_reports_each_size_and_rolls_back(self):
+        output = io.StringIO()
+        call_command('benchmark_tracking_ingestion', '--trackings', '3', stdout=output)
+        self.assertRegex(output.getvalue(), r'^3 trackings: per-row [\d.]+ ms .*, bulk [\d.]+ ms')
+        self.assertFalse(Tracking.objects.exists())
+        self.assertEqual(User.objects.count(), 1)
+
+
+class HabitStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        create_habits(self.user, 1)
+        self.habit = Habit.objects.get()
+        self.today = date.today()
+
+    def track(self, *days_ago):
+        for days in days_ago:
+            Tracking.objects.create(
+                habit=self.habit, amount_of_days=1, done_date=self.today - timedelta(days=days))
+
+    def test_streaks_follow_inserts_and_deletes(self):
+        self.track(0, 1, 2, 5, 6)
+        stats = HabitStats.objects.get(habit=self.habit)
+        self.assertEqual((stats.current_streak, stats.longest_streak), (3, 3))
+        self.assertEqual(stats.total_completions, 5)
+
+        Tracking.objects.get(done_date=self.today - timedelta(days=1)).delete()
+        stats.refresh_from_db()
+        self.assertEqual((stats.current_streak, stats.longest_streak), (1, 2))
+        self.assertEqual(stats.total_completions, 4)
+
+    def test_failed_stats_update_rolls_back_the_tracking(self):
+        failing = mock.patch('habit.signals.record_trackings', side_effect=DatabaseError)
+        with failing, self.assertRaises(DatabaseError):
+            self.client.post(reverse('create_tracking'), {
+                'habit': self.habit.id, 'amount_of_days': 1,
+                'done_date': self.today.isoformat()}, format='json')
+        self.assertFalse(Tracking.objects.exists())
+
+        self.track(0)
+        with failing, self.assertRaises(DatabaseError):
+            Tracking.objects.get().delete()
+        self.assertEqual(Tracking.objects.count(), 1)
+
+    def test_weekly_periods(self):
+        self.habit.execution_frequency = 'week'
+        self.habit.save()
+        self.track(0, 7, 14)
+
+        stats = HabitStats.objects.get(habit=self.habit)
+        self.assertEqual(stats.longest_streak, 3)
+        self.assertEqual(self.habit.periods.count(), 3)
+
+    def test_frequency_change_rebuilds(self):
+        self.track(0, 7)
+        self.habit.execution_frequency = 'month'
+        self.habit.save()
+
+        stats = HabitStats.objects.get(habit=self.habit)
+        self.assertEqual(stats.execution_frequency, 'month')
+        self.assertEqual(sum(self.habit.periods.values_list('completions', flat=True)), 2)
+
+    def test_bulk_create_updates_stats(self):
+        items = [{'habit': self.habit.id, 'amount_of_days': 1,
+                  'done_date': (self.today - timedelta(days=days)).isoformat()}
+                 for days in range(4)]
+        self.client.post(reverse('bulk_create_tracking'), items, format='json')
+
+        stats = HabitStats.objects.get(habit=self.habit)
+        self.assertEqual((stats.current_streak, stats.total_completions), (4, 4))
+
+    def periods(self):
+        return list(self.habit.periods.order_by('start').values_list('start', 'completions'))
+
+    def test_rebuild_command_matches_incremental_stats(self):
+        self.track(0, 1, 3, 4, 5, 9)
+        incremental, periods = HabitStats.objects.get(habit=self.habit), self.periods()
+        HabitStats.objects.all().delete()
+        HabitPeriod.objects.all().delete()
+
+        call_command('rebuild_habit_stats', stdout=open('/dev/null', 'w'))
+        rebuilt = HabitStats.objects.get(habit=self.habit)
+        self.assertEqual(self.periods(), periods)
+        self.assertEqual(rebuilt.longest_streak, incremental.longest_streak)
+
+    def test_migration_backfills_existing_habits(self):
+        self.track(0, 1, 3)
+        incremental, periods = HabitStats.objects.get(habit=self.habit), self.periods()
+        HabitStats.objects.all().delete()
+        HabitPeriod.objects.all().delete()
+
+        import_module('habit.migrations.0003_habitstats').build_stats(django_apps, None)
+        backfilled = HabitStats.objects.get(habit=self.habit)
+        self.assertEqual(self.periods(), periods)
+        self.assertEqual(
+            (backfilled.total_completions, backfilled.current_streak, backfilled.last_period),
+            (incremental.total_completions, incremental.current_streak, incremental.last_period))
+
+    def test_first_tracking_builds_stats_from_history(self):
+        Tracking.objects.bulk_create([
+            Tracking(habit=self.habit, amount_of_days=1,
+                     done_date=self.today - timedelta(days=days))
+            for days in (1, 2)
+        ])
+        HabitStats.objects.all().delete()
+
+        self.track(0)
+        stats = HabitStats.objects.get(habit=self.habit)
+        self.assertEqual((stats.total_completions, stats.current_streak), (3, 3))
+        self.assertEqual(len(self.periods()), 3)
+
+    def test_check_in_cost_does_not_grow_with_history(self):
+        self.track(40)
+        with CaptureQueriesContext(connection) as short:
+            self.track(20)
+        self.track(*range(21, 40))
+        with CaptureQueriesContext(connection) as long:
+            self.track(0)
+        self.assertEqual(len(long), len(short))
+
+    def test_stats_endpoint(self):
+        self.track(0, 1)
+        url = reverse('habit-stats', args=[self.habit.id])
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.data['current_streak'], 2)
+        self.assertEqual(response.data['progress'], 0.2)
+
+    @override_settings(HABIT_STATS_MAX_PERIODS=2)
+    def test_stats_endpoint_returns_recent_periods(self):
+        self.track(0, 1, 2)
+        response = self.client.get(reverse('habit-stats', args=[self.habit.id]))
+        self.assertEqual(response.data['periods'], {
+            (self.today - timedelta(days=1)).isoformat(): 1, self.today.isoformat(): 1})
+
+    def test_local_streak_updates_match_a_full_walk(self):
+        changes = random.Random(0)
+        for frequency in ('day', 'week', 'month'):
+            self.habit.execution_frequency = frequency
+            self.habit.save()
+            for _ in range(150):
+                day = date(2023, 1, 1) + timedelta(days=changes.randrange(120))
+                tracked = self.habit.trackings.filter(done_date=day).first()
+                if tracked and changes.random() < 0.4:
+                    tracked.delete()
+                else:
+                    Tracking.objects.create(habit=self.habit, amount_of_days=1, done_date=day)
+
+                stats = HabitStats.objects.get(habit=self.habit)
+                expected = HabitStats(habit=self.habit, execution_frequency=frequency)
+                expected.refresh_streaks()
+                self.assertEqual(
+                    (stats.current_streak, stats.longest_streak, stats.last_period),
+                    (expected.current_streak, expected.longest_streak, expected.last_period))
+
+    def test_stats_endpoint_without_trackings(self):
+        response = self.client.get(reverse('habit-stats', args=[self.habit.id]))
+        self.assertEqual(response.data['total_completions'], 0)
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        users = [User.objects.create_user(f'user{number}@example.com', 'password')
+                 for number in range(3)]
+        for user in users:
+            create_habits(user, 30)
+        cls.user = users[0]
+        cls.habit = cls.user.habits.first()
+        Tracking.objects.bulk_create([
+            Tracking(habit=habit, amount_of_days=1,
+                     done_date=date(2023, 1, 1) + timedelta(days=day))
+            for habit in Habit.objects.all() for day in range(0, 365, 7)
+        ])
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def assertIndexScan(self, queryset, index=None):
+        plan = queryset.explain()
+        self.assertNotIn('Seq Scan', plan)
+        self.assertIsNone(re.search(r'\bSCAN \w+$', plan, re.MULTILINE), plan)
+        if index:
+            self.assertIn(index, plan)
+
+    def test_habit_list(self):
+        self.assertIndexScan(Habit.objects.filter(user=self.user).order_by('id')[:51])
+
+    def test_habit_detail(self):
+        self.assertIndexScan(Habit.objects.filter(user=self.user, pk=self.habit.pk))
+
+    def test_habit_ownership_check(self):
+        self.assertIndexScan(
+            Habit.objects.filter(user=self.user, id__in=[self.habit.pk]).values_list('id'))
+
+    def test_tracking_date_range(self):
+        self.assertIndexScan(
+            Tracking.objects.filter(
+                habit=self.habit, done_date__range=(date(2023, 3, 1), date(2023, 6, 1))),
+            index='tracking_habit_date_idx')
+
+    def test_tracking_counts_per_day(self):
+        self.assertIndexScan(
+            Tracking.objects.filter(habit=self.habit).order_by()
+            .values_list('done_date').annotate(count=Count('id')),
+            index='tracking_habit_date_idx')
+
+
+class HeatmapTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        create_habits(self.user, 2)
+        first, second = Habit.objects.all()
+        self.habit = first
+        Tracking.objects.bulk_create([
+            Tracking(habit=first, amount_of_days=1, done_date=date(2023, 1, 2)),
+            Tracking(habit=first, amount_of_days=1, done_date=date(2023, 1, 2)),
+            Tracking(habit=first, amount_of_days=1, done_date=date(2023, 1, 4)),
+            Tracking(habit=second, amount_of_days=1, done_date=date(2023, 1, 10)),
+        ])
+        self.params = {'start': '2023-01-01', 'end': '2023-01-14'}
+
+    def test_daily_counts(self):
+        url = reverse('habit-heatmap', args=[self.habit.id])
+        with self.assertNumQueries(2):
+            response = self.client.get(url, self.params)
+
+        self.assertEqual(response.data['length'], 14)
+        self.assertEqual(response.data['data'][:4], [0, 2, 0, 1])
+        self.assertEqual(sum(response.data['data']), 3)
+
+    def test_missing_or_foreign_habit(self):
+        other = User.objects.create_user('other@example.com', 'password')
+        create_habits(other, 1)
+        for pk in (Habit.objects.get(user=other).id, 0):
+            response = self.client.get(reverse('habit-heatmap', args=[pk]), self.params)
+            self.assertEqual(response.status_code, 404)
+
+    def test_all_habits_weekly(self):
+        response = self.client.get(reverse('habit-heatmap-all'), {**self.params, 'bucket': 'week'})
+        self.assertEqual(str(response.data['start']), '2022-12-26')
+        self.assertEqual(response.data['data'], [0, 3, 1])
+
+    def test_monthly_bucket(self):
+        params = {'start': '2023-01-01', 'end': '2023-03-31', 'bucket': 'month'}
+        response = self.client.get(reverse('habit-heatmap-all'), params)
+        self.assertEqual(response.data['data'], [4, 0, 0])
+
+    def test_base64_and_bitmap_encodings(self):
+        url = reverse('habit-heatmap', args=[self.habit.id])
+        response = self.client.get(url, {**self.params, 'encoding': 'base64'})
+        self.assertEqual(list(base64.b64decode(response.data['data'])[:4]), [0, 2, 0, 1])
+
+        response = self.client.get(url, {**self.params, 'encoding': 'bitmap'})
+        self.assertEqual(base64.b64decode(response.data['data']), bytes([0b01010000, 0]))
+
+    def test_invalid_window(self):
+        response = self.client.get(
+            reverse('habit-heatmap-all'), {'start': '2023-02-01', 'end': '2023-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+class HabitCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('user@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        create_habits(self.user, 1)
+        self.habit = Habit.objects.get()
+        self.url = reverse('habit-list')
+
+    def test_repeated_read_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_if_none_match_returns_not_modified(self):
+        url = reverse('habit-detail', args=[self.habit.id])
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_writes_invalidate_cached_reads(self):
+        self.client.get(self.url)
+        self.client.post(self.url, {
+            'title': 'New', 'description': 'Description', 'number_of_repeats': 1,
+            'execution_frequency': 'day', 'start_date': '2023-01-01', 'end_date': '2023-01-31'
+        }, format='json')
+
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_caches_are_per_user(self):
+        self.client.get(self.url)
+        other = User.objects.create_user('other@example.com', 'password')
+        self.client.force_authenticate(other)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['results'], [])
+
+
+class AsyncHabitViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('user@example.com', 'password')
+        create_habits(self.user, 3)
+        self.habit = Habit.objects.first()
+        token = RefreshToken.for_user(self.user).access_token
+        self.headers = {'headers': {'Authorization': f'Bearer {token}'}}
+
+    async def test_list_pages_with_cursor(self):
+        url = reverse('async:habit-list')
+        response = await self.async_client.get(url, {'page_size': 2}, **self.headers)
+        data = response.json()
+        self.assertEqual(len(data['results']), 2)
+
+        response = await self.async_client.get(data['next'], **self.headers)
+        data = response.json()
+        self.assertEqual(len(data['results']), 1)
+        self.assertIsNone(data['next'])
+
+    async def test_requires_token(self):
+        response = await self.async_client.get(reverse('async:habit-list'))
+        self.assertEqual(response.status_code, 401)
+
+    async def test_create_update_delete(self):
+        payload = {
+            'title': 'Async', 'description': 'Description', 'number_of_repeats': 1,
+            'execution_frequency': 'week', 'start_date': '2023-01-01', 'end_date': '2023-01-31'
+        }
+        response = await self.async_client.post(
+            reverse('async:habit-list'), payload, content_type='application/json', **self.headers)
+        self.assertEqual(response.status_code, 201)
+
+        url = reverse('async:habit-detail', args=[self.habit.id])
+        response = await self.async_client.put(
+            url, {**payload, 'title': 'Renamed'}, content_type='application/json',
+            **self.headers)
+        self.assertEqual(response.json()['title'], 'Renamed')
+
+        response = await self.async_client.patch(
+            url, {'number_of_repeats': 5}, content_type='application/json', **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['title'], response.json()['number_of_repeats']),
+                         ('Renamed', 5))
+
+        response = await self.async_client.delete(url, **self.headers)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(await Habit.objects.filter(user=self.user).acount(), 3)
+
+    async def test_reads_are_tagged_for_conditional_requests(self):
+        url = reverse('async:habit-detail', args=[self.habit.id])
+        etag = (await self.async_client.get(url, **self.headers))['ETag']
+        self.assertEqual(etag, make_etag(HabitSerializer(self.habit).data))
+
+        headers = {**self.headers['headers'], 'If-None-Match': etag}
+        response = await self.async_client.get(url, headers=headers)
+        self.assertEqual(response.status_code, 304)
+        response = await self.async_client.get(reverse('async:habit-list'), **self.headers)
+        self.assertTrue(response['ETag'])
+
+        response = await self.async_client.delete(
+            url, headers={**self.headers['headers'], 'If-Match': etag})
+        self.assertEqual(response.status_code, 204)
+
+    async def test_create_tracking_checks_ownership(self):
+        url = reverse('async:create_tracking')
+        payload = {'habit': self.habit.id, 'amount_of_days': 1, 'done_date': '2023-01-02'}
+        response = await self.async_client.post(
+            url, payload, content_type='application/json', **self.headers)
+        self.assertEqual(response.status_code, 201)
+
+        response = await self.async_client.post(
+            url, {**payload, 'habit': 0}, content_type='application/json', **self.headers)
+        self.assertEqual(response.status_code, 404)
+
+
+class StatelessAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('user@example.com', 'password')
+        forget_user(self.user.id)
+        create_habits(self.user, 2)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user.tokens()["access"]}')
+        self.url = reverse('habit-list')
+
+    def test_reads_skip_user_query(self):
+        self.client.get(reverse('habit-detail', args=[Habit.objects.first().id]))
+        # Only the habit page itself: no User SELECT once is_active is cached.
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_writes_work_with_token_user(self):
+        habit = Habit.objects.first()
+        response = self.client.post(reverse('create_tracking'), {
+            'habit': habit.id, 'amount_of_days': 1, 'done_date': '2023-01-01'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_deactivated_user_is_rejected_after_cache_expiry(self):
+        self.user.is_active = False
+        self.user.save()
+        forget_user(self.user.id)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user@example.com', 'password')
+        Profile.objects.create(user=self.user, name='User', avatar='avatar.png',
+                               language='en', color_theme='black')
+        create_habits(self.user, 2)
+        habit = Habit.objects.filter(user=self.user).first()
+        Tracking.objects.bulk_create([
+            Tracking(habit=habit, amount_of_days=1, done_date=date(2023, 1, day))
+            for day in range(1, 4)
+        ])
+        other = User.objects.create_user('other@example.com', 'password')
+        create_habits(other, 1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('export')
+
+    def read(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_ndjson_export(self):
+        with self.assertNumQueries(3):
+            body = self.read(self.client.get(self.url))
+        records = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([record['type'] for record in records],
+                         ['profile', 'habit', 'habit', 'tracking', 'tracking', 'tracking'])
+        self.assertEqual(records[0]['name'], 'User')
+        self.assertEqual(records[3]['done_date'], '2023-01-01')
+
+    def test_csv_export(self):
+        response = self.client.get(self.url, {'file_format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(self.read(response).decode())))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[1]['title'], 'Habit 0')
+
+    def test_gzip_export(self):
+        response = self.client.get(self.url, {'gzip': 'true'})
+        self.assertEqual(response['Content-Disposition'],
+                         'attachment; filename="habits.ndjson.gz"')
+        self.assertEqual(len(gzip.decompress(self.read(response)).splitlines()), 6)
+
+    def test_command_writes_file(self):
+        with tempfile.NamedTemporaryFile(suffix='.csv') as output:
+            call_command('export_user_data', 'user@example.com', '--format', 'csv',
+                         '--output', output.name)
+            self.assertEqual(len(open(output.name).read().splitlines()), 7)
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('user@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('import')
+        self.habit = {'type': 'habit', 'id': 7, 'title': 'Read', 'description': 'Books',
+                      'number_of_repeats': 10, 'execution_frequency': 'day',
+                      'start_date': '2023-01-01', 'end_date': '2023-12-31'}
+
+    def upload(self, records, **data):
+        body = '\n'.join(json.dumps(record) for record in records) + '\nnot json\n'
+        upload = io.BytesIO(body.encode())
+        upload.name = 'habits.ndjson'
+        return self.client.post(self.url, {'file': upload, **data}, format='multipart')
+
+    def test_imports_habits_and_trackings(self):
+        trackings = [{'type': 'tracking', 'habit': 7, 'amount_of_days': 1,
+                      'done_date': f'2023-01-0{day}'} for day in range(1, 4)]
+        response = self.upload([
+            {'type': 'profile', 'name': 'User'},
+            self.habit,
+            {**self.habit, 'id': 8, 'end_date': '2022-01-01'},
+            {**self.habit, 'id': 9, 'execution_frequency': 'year'},
+            *trackings,
+            {'type': 'tracking', 'habit': 8, 'amount_of_days': 1, 'done_date': '2023-01-01'},
+        ])
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['created'], {'habits': 1, 'trackings': 3})
+        self.assertEqual(response.data['skipped'], 1)
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4, 8, 9])
+        self.assertIn('end_date', response.data['errors'][0]['errors'])
+        self.assertIn('execution_frequency', response.data['errors'][1]['errors'])
+        habit = Habit.objects.get(user=self.user)
+        self.assertEqual(habit.trackings.count(), 3)
+        self.assertEqual(HabitStats.objects.get(habit=habit).total_completions, 3)
+
+    def test_trackings_can_reference_existing_habits(self):
+        create_habits(self.user, 1)
+        habit = Habit.objects.get(user=self.user)
+        other = User.objects.create_user('other@example.com', 'password')
+        create_habits(other, 1)
+        foreign = Habit.objects.get(user=other)
+
+        response = self.upload([
+            {'type': 'tracking', 'habit': habit.id, 'amount_of_days': 1,
+             'done_date': '2023-01-01'},
+            {'type': 'tracking', 'habit': foreign.id, 'amount_of_days': 1,
+             'done_date': '2023-01-01'},
+        ])
+        self.assertEqual(response.data['created'], {'habits': 0, 'trackings': 1})
+        self.assertEqual(response.data['errors'][0]['errors'], {'habit': ['Habit not found']})
+        self.assertFalse(foreign.trackings.exists())
+
+    def test_csv_with_byte_order_mark(self):
+        columns = list(self.habit)
+        body = '\ufeff' + ','.join(columns) + '\n' + ','.join(str(self.habit[name])
+                                                              for name in columns) + '\n'
+        upload = io.BytesIO(body.encode())
+        upload.name = 'habits.csv'
+        response = self.client.post(self.url, {'file': upload, 'file_format': 'csv'},
+                                    format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], {'habits': 1, 'trackings': 0})
+
+    def test_fractional_numbers_are_rejected(self):
+        response = self.upload([{**self.habit, 'number_of_repeats': 3.7},
+                                {**self.habit, 'id': 8, 'number_of_repeats': 3.0}])
+        self.assertIn('number_of_repeats', response.data['errors'][0]['errors'])
+        self.assertEqual(Habit.objects.get(user=self.user).number_of_repeats, 3)
+
+    def test_export_round_trip(self):
+        source = User.objects.create_user('source@example.com', 'password')
+        create_habits(source, 3)
+        Tracking.objects.bulk_create([
+            Tracking(habit=habit, amount_of_days=1, done_date=date(2023, 1, 1))
+            for habit in Habit.objects.filter(user=source)
+        ])
+        with tempfile.NamedTemporaryFile(suffix='.csv') as output:
+            call_command('export_user_data', 'source@example.com', '--format', 'csv',
+                         '--output', output.name)
+            out = io.StringIO()
+            # One INSERT per table and batch, plus stats, schedule and rollup upkeep.
+            with self.assertNumQueries(21):
+                call_command('import_user_data', 'user@example.com', output.name,
+                             '--format', 'csv', stdout=out)
+
+        self.assertIn('3 habits, 3 trackings created', out.getvalue())
+        self.assertEqual(Tracking.objects.filter(habit__user=self.user).count(), 3)
+
+    def test_finished_batches_survive_a_crash(self):
+        lines = [json.dumps(self.habit), json.dumps(
+            {'type': 'tracking', 'habit': 7, 'amount_of_days': 1, 'done_date': '2023-01-01'})]
+        crash = mock.patch.object(Importer, 'create_trackings', side_effect=RuntimeError)
+        with crash, self.assertRaises(RuntimeError):
+            import_records(self.user.id, lines, batch_size=1)
+        self.assertEqual(Habit.objects.filter(user=self.user).count(), 1)
+
+
+class HabitScheduleTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user@example.com', 'password')
+        self.today = timezone.localdate()
+
+    def create_habit(self, user=None, frequency='day', number_of_repeats=10):
+        return Habit.objects.create(
+            user=user or self.user, title='Read', description='Books',
+            number_of_repeats=number_of_repeats, execution_frequency=frequency,
+            start_date=self.today - timedelta(days=10), end_date=self.today + timedelta(days=60))
+
+    def test_schedule_follows_trackings(self):
+        habit = self.create_habit()
+        self.assertEqual(HabitSchedule.objects.get(habit=habit).next_due_at, due_at(self.today))
+
+        Tracking.objects.create(habit=habit, amount_of_days=1, done_date=self.today)
+        self.assertEqual(HabitSchedule.objects.get(habit=habit).next_due_at,
+                         due_at(self.today + timedelta(days=1)))
+
+    def test_finished_habit_has_no_due_time(self):
+        habit = self.create_habit(number_of_repeats=1)
+        Tracking.objects.create(habit=habit, amount_of_days=1, done_date=self.today)
+        self.assertIsNone(HabitSchedule.objects.get(habit=habit).next_due_at)
+
+    def test_tick_queues_reminders_once_per_period(self):
+        self.create_habit()
+        self.create_habit(frequency='month')
+        inactive = User.objects.create_user('inactive@example.com', 'password', is_active=False)
+        self.create_habit(user=inactive)
+        now = due_at(self.today)
+
+        with self.assertNumQueries(5):
+            schedules = send_due_reminders(now=now)
+        self.assertEqual(len(schedules), 3)
+        self.assertEqual(
+            list(OutgoingEmail.objects.values_list('to', flat=True)), ['user@example.com'] * 2)
+        self.assertEqual(send_due_reminders(now=now), [])
+
+        next_due = dict(HabitSchedule.objects.values_list('habit__execution_frequency',
+                                                          'next_due_at').distinct())
+        self.assertEqual(next_due['day'], due_at(self.today + timedelta(days=1)))
+        month = (self.today.replace(day=1) + timedelta(days=32)).replace(day=1)
+        self.assertEqual(next_due['month'], due_at(month))
+
+    def test_writes_after_a_tick_keep_the_reminder_sent(self):
+        habit = self.create_habit()
+        now = due_at(self.today)
+        send_due_reminders(now=now)
+
+        Tracking.objects.create(habit=habit, amount_of_days=1,
+                                done_date=self.today - timedelta(days=1))
+        habit.title = 'Read more'
+        habit.save()
+        self.assertEqual(HabitSchedule.objects.get(habit=habit).next_due_at,
+                         due_at(self.today + timedelta(days=1)))
+        self.assertEqual(send_due_reminders(now=now + timedelta(hours=1)), [])
+        self.assertEqual(OutgoingEmail.objects.count(), 1)
+
+    def test_rebuild_command_backfills_schedules(self):
+        habit = self.create_habit()
+        HabitSchedule.objects.all().delete()
+        call_command('rebuild_habit_schedules', stdout=io.StringIO())
+        self.assertEqual(HabitSchedule.objects.get(habit=habit).next_due_at, due_at(self.today))
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.users = [User.objects.create_user(f'user{number}@example.com', 'password')
+                      for number in range(2)]
+        Profile.objects.create(user=self.users[0], name='First', avatar='avatar.png',
+                               language='en', color_theme='black')
+        self.habits = [
+            Habit.objects.create(
+                user=user, title='Read', description='Books', number_of_repeats=10,
+                execution_frequency=frequency, start_date=self.today - timedelta(days=30),
+                end_date=self.today + timedelta(days=30))
+            for user, frequency in [(self.users[0], 'day'), (self.users[1], 'day'),
+                                    (self.users[1], 'week')]
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def track(self, habit, *days_ago):
+        for days in days_ago:
+            Tracking.objects.create(habit=habit, amount_of_days=1,
+                                    done_date=self.today - timedelta(days=days))
+
+    def activity(self):
+        rollups.fold_rollups()
+        return {row['day']: (row['active_users'], row['completions'])
+                for row in rollups.daily_activity(self.today - timedelta(days=7), self.today)}
+
+    def rates(self):
+        rollups.fold_rollups()
+        return {row['execution_frequency']: row for row in rollups.completion_rates()}
+
+    def test_rollups_follow_trackings(self):
+        self.track(self.habits[0], 0, 1, 2)
+        self.track(self.habits[1], 0)
+        self.track(self.habits[2], 0)
+        yesterday = self.today - timedelta(days=1)
+        self.assertEqual(self.activity()[self.today], (2, 3))
+        self.assertEqual(self.activity()[yesterday], (1, 1))
+
+        self.habits[0].trackings.get(done_date=yesterday).delete()
+        self.assertEqual(self.activity()[yesterday], (0, 0))
+        rates = self.rates()
+        self.assertEqual((rates['day']['habits'], rates['day']['completions']), (2, 3))
+        self.assertEqual(rates['week']['completion_rate'], 0.1)
+
+    def test_habit_changes_move_between_frequencies(self):
+        self.track(self.habits[0], 0, 1)
+        self.habits[0].execution_frequency = 'week'
+        self.habits[0].save()
+        self.habits[1].delete()
+        rates = self.rates()
+        self.assertNotIn('day', rates)
+        self.assertEqual((rates['week']['habits'], rates['week']['completions']), (2, 2))
+
+    def test_endpoint_reads_only_rollups(self):
+        self.track(self.habits[0], 0, 1, 2)
+        self.track(self.habits[1], 0)
+        rollups.fold_rollups()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('leaderboard'), {'days': 7, 'limit': 1})
+        self.assertEqual(len(queries), 3)
+        self.assertFalse(any('habit_tracking' in query['sql'] for query in queries))
+        self.assertEqual(response.data['top_streaks'], [
+            {'longest_streak': 3, 'execution_frequency': 'day', 'name': 'First'}])
+        self.assertEqual(response.data['activity'][-1]['active_users'], 2)
+
+    def test_rebuild_command_matches_incremental_rollups(self):
+        self.track(self.habits[0], 0, 1, 2)
+        self.track(self.habits[1], 0, 5)
+        self.habits[2].delete()
+        incremental = (self.activity(), rollups.completion_rates())
+        call_command('rebuild_habit_rollups', stdout=io.StringIO())
+        self.assertEqual((self.activity(), rollups.completion_rates()), incremental)
+
+    def test_tracking_writes_only_append_deltas(self):
+        self.track(self.habits[0], 0)
+        rollups.fold_rollups()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('create_tracking'), {
+                'habit': self.habits[0].id, 'amount_of_days': 1,
+                'done_date': self.today.isoformat()}, format='json')
+        self.assertEqual(response.status_code, 201)
+        rollup_tables = ('habit_frequencyrollup', 'habit_activityday', 'habit_useractivityday')
+        self.assertFalse([query['sql'] for query in queries
+                          if any(table in query['sql'] for table in rollup_tables)])
+        self.assertEqual(RollupDelta.objects.count(), 1)
+
+        output = io.StringIO()
+        call_command('fold_habit_rollups', stdout=output)
+        self.assertIn('Folded 1 deltas', output.getvalue())
+        self.assertEqual(self.activity()[self.today], (1, 2))
+        self.assertFalse(RollupDelta.objects.exists())
+
+
+class ConditionalWriteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('user@example.com', 'password')
+        create_habits(self.user, 1)
+        self.habit = Habit.objects.get()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('habit-detail', args=[self.habit.id])
+        self.payload = {
+            'title': 'Habit 0', 'description': 'Description', 'number_of_repeats': 10,
+            'execution_frequency': 'day', 'start_date': '2023-01-01', 'end_date': '2023-12-31'
+        }
+
+    def track(self, key, done_date='2023-01-01'):
+        return self.client.post(reverse('create_tracking'), {
+            'habit': self.habit.id, 'amount_of_days': 1, 'done_date': done_date
+        }, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retried_tracking_is_replayed(self):
+        first = self.track('retry-1')
+        with self.assertNumQueries(0):
+            second = self.track('retry-1')
+
+        self.assertEqual((first.status_code, second.status_code), (201, 201))
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.habit.trackings.count(), 1)
+        self.assertEqual(self.track('retry-2').status_code, 201)
+
+    def test_key_of_a_crashed_request_expires_quickly(self):
+        # A worker killed mid-request never clears its marker.
+        with mock.patch.object(Tracking, 'save', side_effect=SystemExit):
+            with self.assertRaises(SystemExit):
+                self.track('retry-1')
+        self.assertEqual(self.track('retry-1').status_code, 409)
+
+        later = time.time() + settings.IDEMPOTENCY_IN_PROGRESS_TTL + 1
+        with mock.patch('time.time', return_value=later):
+            self.assertEqual(self.track('retry-1').status_code, 201)
+
+    def test_key_reused_for_another_payload_is_rejected(self):
+        self.track('retry-1')
+        self.assertEqual(self.track('retry-1', done_date='2023-01-02').status_code, 422)
+
+    def test_if_match_guards_updates_and_deletes(self):
+        etag = self.client.get(self.url)['ETag']
+        changed = {**self.payload, 'title': 'Changed'}
+
+        response = self.client.put(self.url, changed, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], self.client.get(self.url)['ETag'])
+
+        response = self.client.put(self.url, self.payload, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(self.client.delete(self.url, HTTP_IF_MATCH=etag).status_code, 412)
+        self.assertEqual(Habit.objects.get().title, 'Changed')
+
+    def test_unchanged_update_skips_the_write(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(self.url, self.payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any(query['sql'].startswith('UPDATE') for query in queries))
+
+    async def test_async_views_honour_keys_and_preconditions(self):
+        token = AccessToken.for_user(self.user)
+        headers = {'Authorization': f'Bearer {token}', 'Idempotency-Key': 'async-1'}
+        url = reverse('async:create_tracking')
+        payload = {'habit': self.habit.id, 'amount_of_days': 1, 'done_date': '2023-01-01'}
+        for _ in range(2):
+            response = await self.async_client.post(
+                url, payload, content_type='application/json', headers=headers)
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.assertEqual(await Tracking.objects.acount(), 1)
+
+        response = await self.async_client.put(
+            reverse('async:habit-detail', args=[self.habit.id]), self.payload,
+            content_type='application/json',
+            headers={'Authorization': headers['Authorization'], 'If-Match': '"stale"'})
+        self.assertEqual(response.status_code, 412)
+
+
+class PartialUpdateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('user@example.com', 'password')
+        create_habits(self.user, 1)
+        self.habit = Habit.objects.get()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('habit-detail', args=[self.habit.id])
+
+    def test_patch_writes_only_the_changed_column(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                self.url, {'title': 'Renamed', 'description': 'Description'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['number_of_repeats'], 10)
+
+        updates = [query['sql'] for query in queries
+                   if query['sql'].startswith('UPDATE "habit_habit"')]
+        self.assertEqual(updates, [
+            f'UPDATE "habit_habit" SET "title" = \'Renamed\' '
+            f'WHERE "habit_habit"."id" = {self.habit.id}'
+        ])
+
+    def test_patch_validates_only_sent_fields(self):
+        response = self.client.patch(self.url, {'execution_frequency': 'year'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data), ['execution_frequency'])
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        self.user = User.objects.create_user('user@example.com', 'password')
+        create_habits(self.user, 3)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(DEBUG=True)
+    def test_requests_are_aggregated_per_endpoint(self):
+        for _ in range(2):
+            self.client.get(reverse('habit-list'))
+        self.client.get(reverse('habit-detail', args=[0]))
+
+        body = self.client.get(reverse('metrics')).content.decode()
+        labels = 'endpoint="habit-list",method="GET"'
+        self.assertIn(f'habits_requests_total{{{labels},status="200"}} 2', body)
+        self.assertIn('habits_requests_total{endpoint="habit-detail",method="GET",status="404"} 1',
+                      body)
+        self.assertIn(f'habits_db_queries_count{{{labels}}} 2', body)
+        self.assertIn(f'habits_response_bytes_bucket{{{labels},le="+Inf"}} 2', body)
+        queries = re.search(rf'habits_db_queries_sum{{{labels}}} (\d+)', body)
+        self.assertGreater(int(queries.group(1)), 0)
+        self.assertIn(f'habits_render_duration_seconds_count{{{labels}}} 2', body)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint_requires_configured_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN=None, DEBUG=False)
+    def test_metrics_endpoint_is_closed_without_token_outside_debug(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    @override_settings(SLOW_REQUEST_MS=50)
+    def test_slow_requests_are_logged_with_fingerprints(self):
+        clock = mock.patch('core.middleware.perf_counter', side_effect=itertools.count(0, 0.1))
+        with clock, self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.client.get(reverse('habit-list'))
+        self.assertIn('Slow request GET /habit/habits/ (habit-list)', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    def test_fingerprints_ignore_values(self):
+        self.assertEqual(
+            metrics.fingerprint("SELECT * FROM t WHERE id IN (%s, %s) AND n = 5 AND s = 'x'"),
+            'SELECT * FROM t WHERE id IN (...) AND n = ? AND s = ?')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('user@example.com', 'password')
+        create_habits(self.user, 1)
+        self.habit = Habit.objects.get()
+        # The replica copy lags behind the primary.
+        User.objects.using('replica').create(id=self.user.id, email=self.user.email)
+        Habit.objects.using('replica').create(
+            id=self.habit.id, user_id=self.user.id, title='Stale', description='Description',
+            number_of_repeats=10, execution_frequency='day',
+            start_date=date(2023, 1, 1), end_date=date(2023, 12, 31))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_and_retrieve_read_from_the_replica(self):
+        with self.assertNumQueries(0), self.assertNumQueries(2, using='replica'):
+            listed = self.client.get(reverse('habit-list'))
+            retrieved = self.client.get(reverse('habit-detail', args=[self.habit.id]))
+        self.assertEqual(listed.data['results'][0]['title'], 'Stale')
+        self.assertEqual(retrieved.data['title'], 'Stale')
+
+    def test_writes_go_to_the_primary(self):
+        with self.assertNumQueries(0, using='replica'):
+            response = self.client.patch(
+                reverse('habit-detail', args=[self.habit.id]), {'title': 'Renamed'},
+                format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Habit.objects.get().title, 'Renamed')
+        self.assertEqual(Habit.objects.using('replica').get().title, 'Stale')
+
+    def test_reads_follow_the_writer_to_the_primary(self):
+        payload = {
+            'title': 'Fresh', 'description': 'Description', 'number_of_repeats': 1,
+            'execution_frequency': 'week', 'start_date': '2023-01-01', 'end_date': '2023-01-31'
+        }
+        response = self.client.post(reverse('habit-list'), payload, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        with self.assertNumQueries(0, using='replica'):
+            response = self.client.get(reverse('habit-list'))
+        self.assertEqual([habit['title'] for habit in response.data['results']],
+                         ['Habit 0', 'Fresh'])
+
+        # Once the window passes the replica serves the user again.
+        cache.delete(f'primary-pin:{self.user.id}')
+        response = self.client.get(reverse('habit-detail', args=[self.habit.id]))
+        self.assertEqual(response.data['title'], 'Stale')
+
+    def test_failed_writes_and_other_users_keep_reading_the_replica(self):
+        response = self.client.post(reverse('habit-list'), {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        other = User.objects.create_user('other@example.com', 'password')
+        other_client = APIClient()
+        other_client.force_authenticate(other)
+        other_client.post(reverse('habit-list'), {}, format='json')
+
+        response = self.client.get(reverse('habit-detail', args=[self.habit.id]))
+        self.assertEqual(response.data['title'], 'Stale')
+
+    async def test_async_views_pin_reads_after_writes(self):
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        url = reverse('async:habit-detail', args=[self.habit.id])
+        response = await self.async_client.get(url, headers=headers)
+        self.assertEqual(response.json()['title'], 'Stale')
+
+        payload = {**response.json(), 'title': 'Renamed'}
+        response = await self.async_client.put(
+            url, payload, content_type='application/json', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get(url, headers=headers)
+        self.assertEqual(response.json()['title'], 'Renamed')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_reads_stay_on_the_primary_without_replicas(self):
+        with self.assertNumQueries(0, using='replica'):
+            response = self.client.get(reverse('habit-list'))
+        self.assertEqual(response.data['results'][0]['title'], 'Habit 0')
+
+
+class JSONRenderingTests(TestCase):
+    payload = {
+        'date': date(2023, 1, 2), 'created': datetime(
+            2023, 1, 2, 3, 4, 5, 678901, timezone.get_fixed_timezone(0)),
+        'rate': Decimal('0.25'), 'label': gettext_lazy('Habit'), 1: 'integer key',
+        'text': 'line\u2028separator \u00e9', 'nested': [{'empty': None, 'flag': True}],
+    }
+
+    def test_matches_the_stdlib_renderer(self):
+        expected = JSONRenderer().render(self.payload)
+        self.assertEqual(FastJSONRenderer().render(self.payload), expected)
+        with mock.patch('core.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.payload), expected)
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_indented_rendering_is_delegated(self):
+        media_type = 'application/json; indent=2'
+        self.assertEqual(FastJSONRenderer().render(self.payload, media_type),
+                         JSONRenderer().render(self.payload, media_type))
+
+    def test_parses_requests_and_rejects_invalid_json(self):
+        user = User.objects.create_user('user@example.com', 'password')
+        client = APIClient()
+        client.force_authenticate(user)
+        payload = {
+            'title': 'Run', 'description': 'Description', 'number_of_repeats': 1,
+            'execution_frequency': 'week', 'start_date': '2023-01-01', 'end_date': '2023-01-31'
+        }
+        response = client.post(reverse('habit-list'), json.dumps(payload),
+                               content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        response = client.post(reverse('habit-list'), '{"title":',
+                               content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.data['detail'])
+
+    def test_benchmark_reports_both_renderers(self):
+        output = io.StringIO()
+        call_command('benchmark_json_rendering', '--habits', '10', '--rounds', '1',
+                     stdout=output)
+        self.assertIn('FastJSONRenderer', output.getvalue())
+        self.assertIn('Speedup', output.getvalue())
+
+
+class HabitReadPathTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('user@example.com', 'password')
+        Habit.objects.bulk_create([
+            Habit(user=self.user, title=title, description=description,
+                  number_of_repeats=repeats, execution_frequency=frequency,
+                  start_date=date(2023, 1, day), end_date=date(2024, 2, 29))
+            for day, (title, description, repeats, frequency) in enumerate([
+                ('Run', 'Every morning', 1, 'day'),
+                ('Lire é', '', 0, 'week'),
+                ('"Quoted"', 'Line\nbreak', -3, 'month'),
+            ], start=1)
+        ])
+        self.habits = Habit.objects.filter(user=self.user).order_by('id')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_matches_habit_serializer(self):
+        for fields in [None, ['end_date'], ['number_of_repeats', 'title', 'start_date']]:
+            params = {'fields': ','.join(fields)} if fields else {}
+            response = self.client.get(reverse('habit-list'), params)
+            expected = HabitSerializer(self.habits, many=True, fields=fields).data
+            self.assertEqual(response.content, JSONRenderer().render(
+                {'next': None, 'previous': None, 'results': expected}))
+
+    def test_retrieve_matches_habit_serializer(self):
+        for habit in self.habits:
+            response = self.client.get(reverse('habit-detail', args=[habit.id]))
+            self.assertEqual(response.content, JSONRenderer().render(HabitSerializer(habit).data))
+        response = self.client.get(reverse('habit-detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_views_match_habit_serializer(self):
+        habits = [habit async for habit in self.habits]
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        response = await self.async_client.get(reverse('async:habit-list'), headers=headers)
+        self.assertEqual(response.json()['results'],
+                         HabitSerializer(habits, many=True).data)
+        response = await self.async_client.get(
+            reverse('async:habit-detail', args=[habits[0].id]), headers=headers)
+        self.assertEqual(response.json(), HabitSerializer(habits[0]).data)
+
+    def test_benchmark_reports_each_size(self):
+        output = io.StringIO()
+        call_command('benchmark_habit_serialization', '--rows', '10', '20', stdout=output)
+        self.assertEqual(len(output.getvalue().splitlines()), 2)
@@ -1,12 +1,19 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from habit.views import HabitViewSet, CreateTrackingView
+from habit.views import (
+    HabitViewSet, CreateTrackingView, BulkCreateTrackingView, ExportView, ImportView,
+    LeaderboardView
+)
 
 router = DefaultRouter()
 router.register(r'habits', HabitViewSet, basename='habit')
 
 urlpatterns = [
     path('', include(router.urls)),
-    path('trackings/', CreateTrackingView.as_view(), name='create_tracking')
+    path('trackings/', CreateTrackingView.as_view(), name='create_tracking'),
+    path('trackings/bulk/', BulkCreateTrackingView.as_view(), name='bulk_create_tracking'),
+    path('export/', ExportView.as_view(), name='export'),
+    path('import/', ImportView.as_view(), name='import'),
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard')
 ]
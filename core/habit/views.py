@@ -1,53 +1,224 @@
+import codecs
+from datetime import timedelta
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from rest_framework import generics, permissions, viewsets, status
+from rest_framework.authentication import BasicAuthentication, SessionAuthentication
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 
-from habit.models import Habit, Tracking
-from habit.serializers import HabitSerializer, TrackingSerializer
+from accounts.authentication import StatelessJWTAuthentication
+from core.cache import bump_version, cache_user_response, check_if_match, make_etag
+from core.idempotency import idempotent
+from core.parsers import FastJSONParser
+from core.routers import replica_reads
+from core.updates import changed_fields
+from habit import messages, rollups
+from habit.export import CONTENT_TYPES, export_stream
+from habit.heatmap import count_trackings, encode
+from habit.importer import import_records
+from habit.models import Habit, HabitStats, Tracking
+from habit.pagination import HabitCursorPagination
+from habit.parsers import NDJSONParser
+from habit.serializers import (
+    HabitSerializer, TrackingSerializer, BulkTrackingSerializer, HabitStatsSerializer,
+    HeatmapQuerySerializer, ExportQuerySerializer, ImportSerializer, LeaderboardQuerySerializer,
+    habit_row_mapper, parse_projection
+)
+from habit.services import bulk_create_trackings
+
+AUTHENTICATION_CLASSES = [StatelessJWTAuthentication, BasicAuthentication, SessionAuthentication]
 
 
 class HabitViewSet(viewsets.GenericViewSet):
     serializer_class = HabitSerializer
+    authentication_classes = AUTHENTICATION_CLASSES
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = HabitCursorPagination
 
     def get_queryset(self):
-        return self.request.user.habits.all()
+        return Habit.objects.filter(user_id=self.request.user.id)
 
+    @cache_user_response('habits')
+    @replica_reads
     def list(self, request):
-        serializer = self.serializer_class(self.get_queryset(), many=True)
-        return Response(serializer.data)
+        columns, to_representation = habit_row_mapper(
+            parse_projection(request.query_params.get('fields')))
+        # Named rows expose the id the cursor pagination reads its position from.
+        queryset = self.get_queryset().values_list(*columns, 'id', named=True)
+
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(to_representation(page))
 
+    @idempotent('habits')
     def create(self, request):
         serializer = self.serializer_class(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
-        serializer.save(user=request.user)
+        serializer.save(user_id=request.user.id)
+        bump_version(request.user.id)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @cache_user_response('habits')
+    @replica_reads
     def retrieve(self, request, pk=None):
-        habit = get_object_or_404(self.get_queryset(), pk=pk)
-        serializer = self.serializer_class(habit)
-        return Response(serializer.data)
+        columns, to_representation = habit_row_mapper()
+        row = get_object_or_404(self.get_queryset().values_list(*columns), pk=pk)
+        return Response(to_representation([row])[0])
 
-    def update(self, request, pk=None):
+    def write(self, request, pk, partial):
         habit = get_object_or_404(self.get_queryset(), pk=pk)
-        serializer = self.serializer_class(habit, data=request.data)
+        check_if_match(request, self.serializer_class(habit).data)
+        serializer = self.serializer_class(habit, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
-        serializer.save(user=request.user)
-        return Response(serializer.data)
+        # Retried or unchanged payloads leave the row and the cached responses alone.
+        if changed_fields(habit, serializer.validated_data):
+            serializer.save(user_id=request.user.id)
+            bump_version(request.user.id)
+        return Response(serializer.data, headers={'ETag': make_etag(serializer.data)})
 
+    @idempotent('habits')
+    def update(self, request, pk=None):
+        return self.write(request, pk, partial=False)
+
+    @idempotent('habits')
+    def partial_update(self, request, pk=None):
+        return self.write(request, pk, partial=True)
+
+    @idempotent('habits')
     def destroy(self, request, pk=None):
         habit = get_object_or_404(self.get_queryset(), pk=pk)
+        check_if_match(request, self.serializer_class(habit).data)
         habit.delete()
+        bump_version(request.user.id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        habit = get_object_or_404(self.get_queryset().select_related('stats'), pk=pk)
+        try:
+            stats = habit.stats
+        except HabitStats.DoesNotExist:
+            stats = HabitStats(habit=habit, execution_frequency=habit.execution_frequency)
+        return Response(HabitStatsSerializer(stats).data)
+
+    @staticmethod
+    def heatmap_response(request, trackings):
+        query = HeatmapQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        starts, counts = count_trackings(
+            trackings, params['start'], params['end'], params['bucket'])
+        return Response({
+            'start': starts[0], 'bucket': params['bucket'], 'length': len(counts),
+            'encoding': params['encoding'], 'data': encode(counts, params['encoding'])
+        })
+
+    @action(detail=True, methods=['get'])
+    def heatmap(self, request, pk=None):
+        habit = get_object_or_404(self.get_queryset(), pk=pk)
+        return self.heatmap_response(request, habit.trackings.all())
+
+    @action(detail=False, methods=['get'], url_path='heatmap', url_name='heatmap-all')
+    def heatmap_all(self, request):
+        return self.heatmap_response(
+            request, Tracking.objects.filter(habit__user_id=request.user.id))
+
 
 class CreateTrackingView(generics.CreateAPIView):
     queryset = Tracking.objects.all()
     serializer_class = TrackingSerializer
+    authentication_classes = AUTHENTICATION_CLASSES
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent('trackings')
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         user = self.request.user
         habit_id = self.request.data.get('habit')
-        habit = get_object_or_404(Habit, id=habit_id, user=user)
+        habit = get_object_or_404(Habit, id=habit_id, user_id=user.id)
         serializer.save(habit=habit)
+        bump_version(user.id)
+
+
+class BulkCreateTrackingView(generics.GenericAPIView):
+    serializer_class = BulkTrackingSerializer
+    authentication_classes = AUTHENTICATION_CLASSES
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [FastJSONParser, NDJSONParser]
+    batch_size = 500
+    max_items = 1000
+
+    def validate_items(self, items):
+        if not isinstance(items, list):
+            raise ValidationError({'error': messages.EXPECTED_LIST})
+        if len(items) > self.max_items:
+            raise ValidationError(
+                {'error': messages.TOO_MANY_ITEMS.format(max_items=self.max_items)})
+
+    @idempotent('trackings')
+    def post(self, request):
+        self.validate_items(request.data)
+        results = bulk_create_trackings(request.user.id, request.data, self.batch_size)
+        bump_version(request.user.id)
+        failed = any(result['status'] == 'error' for result in results)
+        return Response({'results': results},
+                        status=status.HTTP_207_MULTI_STATUS if failed else status.HTTP_201_CREATED)
+
+
+class ExportView(generics.GenericAPIView):
+    serializer_class = ExportQuerySerializer
+    authentication_classes = AUTHENTICATION_CLASSES
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        query = self.serializer_class(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        file_format, compress = query.validated_data['file_format'], query.validated_data['gzip']
+
+        filename = f'habits.{file_format}' + ('.gz' if compress else '')
+        response = StreamingHttpResponse(
+            export_stream(request.user.id, file_format, compress),
+            content_type='application/gzip' if compress else CONTENT_TYPES[file_format])
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ImportView(generics.GenericAPIView):
+    serializer_class = ImportSerializer
+    authentication_classes = AUTHENTICATION_CLASSES
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser]
+    batch_size = 1000
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lines = codecs.iterdecode(serializer.validated_data['file'], 'utf-8-sig')
+        report = import_records(request.user.id, lines, serializer.validated_data['file_format'],
+                                self.batch_size)
+        return Response(report, status=status.HTTP_207_MULTI_STATUS if report['error_count']
+                        else status.HTTP_201_CREATED)
+
+
+class LeaderboardView(generics.GenericAPIView):
+    serializer_class = LeaderboardQuerySerializer
+    authentication_classes = AUTHENTICATION_CLASSES
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        query = self.serializer_class(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        end = timezone.localdate()
+        start = end - timedelta(days=query.validated_data['days'] - 1)
+        return Response({
+            'top_streaks': rollups.top_streaks(query.validated_data['limit']),
+            'completion_rates': rollups.completion_rates(),
+            'activity': rollups.daily_activity(start, end),
+        })